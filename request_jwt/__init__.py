@@ -1 +1,7 @@
 from . import controllers
+from . import models
+from . import tools
+
+
+def post_load():
+    tools.preflight.patch_request()
@@ -5,14 +5,19 @@
     "summary": """
         Custom module for auth_jwt and custom endpoints.
     """,
-    "version": "16.0.1.1.1",
+    "version": "16.0.1.3.0",
     "license": "LGPL-3",
     "category": "Applications",
     "author": "PopSolutions <pop.coop>",
     "maintainers": ["sbidoul"],
     "website": "https://github.com/popsolutions/odoo_api_server",
-    "depends": ["auth_jwt"],
+    "depends": ["auth_jwt", "bus", "sale"],
     "images": ["static/description/icon.png"],
-    "data": ["data/auth_jwt_validator.xml"],
+    "data": [
+        "security/ir.model.access.csv",
+        "data/auth_jwt_validator.xml",
+        "data/ir_cron.xml",
+    ],
     "demo": ["demo/auth_jwt_validator.xml"],
+    "post_load": "post_load",
 }
@@ -4,3 +4,7 @@ from . import main
 from . import res_partner
 from . import products
 from . import sale_order
+from . import batch
+from . import metrics
+from . import export
+from . import changes
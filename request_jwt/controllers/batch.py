@@ -0,0 +1,154 @@
+"""Batch controller for the JWT API."""
+
+import json
+import logging
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from odoo.exceptions import AccessDenied, AccessError, MissingError, UserError
+from odoo.http import Controller, HTTPRequest, request, route
+
+from .utils import ApiError, json_response
+
+_logger = logging.getLogger(__name__)
+
+BATCH_ROUTE = "/api/batch"
+# Routes that can not run in the cursor of a batch request.
+EXCLUDED_ROUTES = (BATCH_ROUTE, "/api/changes")
+MAX_BATCH_REQUESTS = 50
+BATCH_METHODS = ("GET", "POST")
+# Headers of the batch request that are not passed on to its sub-requests.
+BATCH_HEADERS = ("Content-Length", "Content-Type", "Accept", "Accept-Encoding")
+
+
+def _parse_batch(body):
+    """Return the sub-requests of a batch request body.
+    - Raise an ``ApiError`` if the body is not a list of sub-requests.
+    """
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise ApiError("Invalid JSON.") from None
+    if isinstance(items, dict):
+        items = items.get("requests")
+    if not isinstance(items, list) or not all(
+        isinstance(item, dict) and isinstance(item.get("path"), str) for item in items
+    ):
+        raise ApiError("The request body must be a list of sub-requests.")
+    if len(items) > MAX_BATCH_REQUESTS:
+        raise ApiError(f"A batch is limited to {MAX_BATCH_REQUESTS} sub-requests.")
+    return items
+
+
+def _error_status(error):
+    """Return the HTTP status code matching an exception of a sub-request."""
+    if isinstance(error, HTTPException):
+        return error.code
+    if isinstance(error, (AccessError, AccessDenied)):
+        return 403
+    if isinstance(error, MissingError):
+        return 404
+    if isinstance(error, UserError):
+        return 400
+    return 500
+
+
+class JWTBatchController(Controller):
+    """Controller to run several API calls in a single HTTP request.
+    - [POST] /batch: run a list of sub-requests.
+    """
+
+    @route(
+        BATCH_ROUTE,
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["POST", "OPTIONS"],
+    )
+    def batch(self):
+        """Run a list of sub-requests against the other API endpoints.
+        - Request body must be a JSON list, or an object with a ``requests``
+          list, of sub-requests ``{"method", "path", "headers", "body"}``;
+          only ``path`` is required, ``method`` defaults to ``GET``.
+        - The token is checked once for the whole batch, and the sub-requests
+          run in order in the cursor of the batch request. Each sub-request is
+          subject to the admission limits of its route and gets a ``429``
+          when refused. Each runs in a
+          savepoint, so a failing sub-request does not undo the others.
+        - Return a JSON object with a ``responses`` list holding the
+          ``status`` and the decoded ``body`` of each sub-request.
+        - Only the endpoints authenticated by JWT can be called, batches can
+          not be nested, long-polling ``/api/changes`` is forbidden, and
+          streamed responses are refused.
+        """
+        try:
+            items = _parse_batch(request.httprequest.get_data())
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        return json_response({"responses": [self._run(item) for item in items]})
+
+    def _sub_request(self, item):
+        """Return the ``HTTPRequest`` of a sub-request of the batch."""
+        httprequest = request.httprequest
+        headers = {
+            key: value
+            for key, value in httprequest.headers.items()
+            if key not in BATCH_HEADERS
+        }
+        headers["Accept"] = "application/json"
+        headers.update(item.get("headers") or {})
+        builder = EnvironBuilder(
+            path=item["path"],
+            base_url=httprequest.host_url,
+            method=(item.get("method") or "GET").upper(),
+            headers=headers,
+            data=json.dumps(item["body"]) if "body" in item else None,
+            content_type="application/json" if "body" in item else None,
+            environ_base={"REMOTE_ADDR": httprequest.remote_addr},
+        )
+        try:
+            return HTTPRequest(builder.get_environ())
+        finally:
+            builder.close()
+
+    def _run(self, item):
+        """Run a sub-request and return its status and decoded body."""
+        batch_httprequest, batch_params = request.httprequest, request.params
+        batch_route = getattr(request, "api_route", None)
+        try:
+            request.httprequest = self._sub_request(item)
+            if request.httprequest.method not in BATCH_METHODS:
+                return {"status": 405, "body": {"error": "Method not allowed."}}
+            ir_http = request.env["ir.http"]
+            rule, args = ir_http._match(request.httprequest.path)
+            routing = rule.endpoint.routing
+            if (
+                routing["type"] != "http"
+                or routing["auth"] != "jwt_api"
+                or rule.rule in EXCLUDED_ROUTES
+            ):
+                return {"status": 403, "body": {"error": "Forbidden endpoint."}}
+            request.params = dict(request.httprequest.args.to_dict(), **args)
+            # Admission control charges the sub-request to its own route.
+            request.api_route = rule.rule
+            with request.env.cr.savepoint():
+                response = ir_http._dispatch(rule.endpoint)
+        except Exception as e:
+            status = _error_status(e)
+            if status == 500:
+                _logger.exception("Batch sub-request %s failed.", item["path"])
+            return {"status": status, "body": {"error": str(e)}}
+        finally:
+            request.httprequest, request.params = batch_httprequest, batch_params
+            request.api_route = batch_route
+        if response.is_streamed:
+            return {"status": 400, "body": {"error": "Streaming is not supported."}}
+        body = response.get_data()
+        if response.mimetype == "application/json" and body:
+            body = json.loads(body)
+        else:
+            body = body.decode("utf-8") or None
+        return {"status": response.status_code, "body": body}
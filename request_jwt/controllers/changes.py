@@ -0,0 +1,158 @@
+"""Controller to push the changes of the API records to the clients."""
+
+import json
+import time
+
+from odoo.http import Controller, request, route
+
+from odoo.addons.bus.models.bus import channel_with_db, json_dump
+
+from ..tools.changes import NOTIFICATION_TYPE, change_channel, change_listener
+from .utils import ApiError, json_response, parse_list, parse_positive_int
+
+CHANGE_MODELS = {
+    "sale_order": "sale.order",
+    "res_partner": "res.partner",
+    "product": "product.product",
+}
+DEFAULT_POLL_TIMEOUT = 30
+# Below the 100 seconds the bus keeps its notifications.
+MAX_POLL_TIMEOUT = 50
+# Wait after a notification, so that a burst of writes is returned at once.
+COALESCE_DELAY = 0.5
+
+
+class JWTChangesController(Controller):
+    """Controller to push the changes of the API records to the clients.
+    - [GET] /changes: wait for the changes of sale orders, partners or
+      products.
+    """
+
+    @route(
+        "/api/changes",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def poll_changes(self, models=None, since=None, timeout=None):
+        """Wait for the changes of the records, long-polling the bus.
+        - ``models`` is a comma separated list of keys of ``CHANGE_MODELS``,
+          all of them by default.
+        - ``since`` is the ``next`` value of the previous response; without
+          it, return at once the ``next`` value to start from.
+        - Wait at most ``timeout`` seconds for a change, 30 by default and at
+          most 50, then return the ids of the ``changes`` and of the
+          ``deleted`` records by model key, and the ``next`` value.
+        - Changed records are filtered by the record rules of the user.
+        - The request cursor is closed before waiting: the notifications are
+          read in short-lived cursors, and the endpoint can not be called in
+          a batch.
+        - Return a ``410`` error if notifications were dropped since
+          ``since``: the client must sync again with the changes endpoints.
+        """
+        try:
+            keys = parse_list(models) if models else list(CHANGE_MODELS)
+            unknown = [key for key in keys if key not in CHANGE_MODELS]
+            if unknown:
+                raise ApiError(f"Unknown model: {unknown[0]}.")
+            timeout = parse_positive_int(
+                timeout, DEFAULT_POLL_TIMEOUT, MAX_POLL_TIMEOUT, "timeout"
+            )
+            if not since:
+                return json_response(
+                    {"changes": {}, "deleted": {}, "next": str(self._last_id())}
+                )
+            try:
+                since = int(since)
+            except ValueError:
+                raise ApiError("Invalid since.") from None
+            self._check_retention(since)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        channels = [change_channel(CHANGE_MODELS[key]) for key in keys]
+        env = request.env
+        # The request cursor is released rather than held while waiting, so a
+        # waiting client holds no connection of the pool.
+        env.cr.commit()
+        env.cr.close()
+        with change_listener.subscribe(env.cr.dbname, channels) as event:
+            data = self._read_changes(env, channels, since)
+            if data is None and event.wait(timeout):
+                time.sleep(COALESCE_DELAY)
+                data = self._read_changes(env, channels, since)
+        if data is None:
+            data = {"changes": {}, "deleted": {}, "next": str(since)}
+        return json_response(data)
+
+    def _read_changes(self, env, channels, since):
+        """Return the changes after ``since`` on ``channels``, or ``None``.
+        - Notifications are read in a cursor of their own, with a snapshot
+          taken after the subscription, then released at once.
+        """
+        with request.registry.cursor() as cr:
+            env = env(cr=cr)
+            notifications = self._read_notifications(env, channels, since)
+            if not notifications:
+                return None
+            return self._collect_changes(env, notifications, since)
+
+    def _last_id(self):
+        """Return the id of the last notification sent on the bus."""
+        request.env.cr.execute(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END"
+            " FROM bus_bus_id_seq"
+        )
+        return request.env.cr.fetchone()[0]
+
+    def _check_retention(self, since):
+        """Raise an ``ApiError`` if notifications after ``since`` were dropped."""
+        request.env.cr.execute("SELECT min(id) FROM bus_bus")
+        oldest = request.env.cr.fetchone()[0] or self._last_id() + 1
+        if since < oldest - 1:
+            raise ApiError(
+                "Notifications expired, a full sync is required.", status=410
+            )
+
+    def _read_notifications(self, env, channels, since):
+        dbname = env.cr.dbname
+        channels = [json_dump(channel_with_db(dbname, channel)) for channel in channels]
+        return (
+            env["bus.bus"]
+            .sudo()
+            .search_read(
+                [("id", ">", since), ("channel", "in", channels)],
+                ["message"],
+                order="id",
+            )
+        )
+
+    def _collect_changes(self, env, notifications, since):
+        """Return the response of the ``notifications`` read for ``env``.
+        - Ids are deduplicated; records the user may not read are left out,
+          and the ids of the records which do not exist anymore are returned
+          as ``deleted``.
+        """
+        ids_by_model = {}
+        for notification in notifications:
+            message = json.loads(notification["message"])
+            if message["type"] != NOTIFICATION_TYPE:
+                continue
+            payload = message["payload"]
+            ids_by_model.setdefault(payload["model"], set()).update(payload["ids"])
+        changes, deleted = {}, {}
+        for key, model_name in CHANGE_MODELS.items():
+            ids = ids_by_model.get(model_name)
+            if not ids:
+                continue
+            model = env[model_name].with_user(env.uid).with_context(active_test=False)
+            existing = set(model.sudo().browse(list(ids)).exists().ids)
+            visible = model.search([("id", "in", list(existing))], order="id").ids
+            if visible:
+                changes[key] = visible
+            if ids - existing:
+                deleted[key] = sorted(ids - existing)
+        next_id = notifications[-1]["id"] if notifications else since
+        return {"changes": changes, "deleted": deleted, "next": str(next_id)}
@@ -0,0 +1,72 @@
+"""Export jobs controller for the JWT API."""
+
+from werkzeug.utils import send_file
+
+from odoo.http import Controller, Response, request, route
+
+from .utils import json_response
+
+
+class JWTExportController(Controller):
+    """Controller to follow and download the export jobs.
+    - [GET] /export/<int:job_id>: get the state of an export job.
+    - [GET] /export/<int:job_id>/download: download the file of an export job.
+    """
+
+    def _get_job(self, job_id):
+        """Return the export job ``job_id`` of the current user, if any."""
+        return (
+            request.env["api.export.job"]
+            .sudo()
+            .search([("id", "=", job_id), ("user_id", "=", request.env.uid)])
+        )
+
+    @route(
+        "/api/export/<int:job_id>",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def get_export(self, job_id):
+        """Get the state of an export job.
+        - Return a JSON object with the ``state`` of the job, ``pending``,
+          ``running``, ``done`` or ``failed``, its ``progress`` between 0
+          and 1 and, once done, the ``size`` of the file.
+        """
+        job = self._get_job(job_id)
+        if not job:
+            return json_response({"error": "Export not found."}, status=404)
+        return json_response({"export": job._get_status()})
+
+    @route(
+        "/api/export/<int:job_id>/download",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def download_export(self, job_id):
+        """Download the gzip compressed file of a finished export job.
+        - ``Range`` requests are supported, so that an interrupted download
+          can be resumed, and ``If-Range`` is checked against the ETag.
+        - Return a ``409`` error while the job is not done.
+        """
+        job = self._get_job(job_id)
+        if not job:
+            return json_response({"error": "Export not found."}, status=404)
+        if job.state != "done":
+            return json_response({"error": "Export not ready."}, status=409)
+        return send_file(
+            job._get_file_path(),
+            request.httprequest.environ,
+            mimetype="application/gzip",
+            as_attachment=True,
+            download_name=f"{job.serializer}_{job.id}.{job.file_format}.gz",
+            etag=job.access_token,
+            response_class=Response,
+        )
@@ -4,7 +4,11 @@ import time
 import json
 import jwt
 
-from odoo.http import Controller, Response, request, route
+from odoo.exceptions import AccessDenied
+from odoo.http import Controller, request, route
+
+from .serializers import serialize
+from .utils import json_response
 
 VALIDATOR_NAME = "api"
 
@@ -12,9 +16,33 @@ VALIDATOR_NAME = "api"
 class JWTLoginController(Controller):
     """Controller to handle JWT authentication.
     - [GET] /auth_jwt: login endpoint
+    - [POST] /auth_jwt/refresh: refresh endpoint
+    - [POST] /auth_jwt/revoke: refresh token revocation endpoint
     - [GET] /auth_jwt/whoami: whoami endpoint
     """
 
+    def _generate_token(self, uid, login):
+        """Return a new access token for the user ``uid``.
+        - The validator, secret and expiration are cached by the validator
+          model, so issuing a token does not query the database.
+        """
+        payload = {
+            "user_id": uid,
+            "email": login,
+        }
+        return request.env["auth.jwt.validator"]._issue_token(VALIDATOR_NAME, payload)
+
+    def _get_refresh_token(self):
+        """Return the refresh token of the JSON request body, or ``None``."""
+        try:
+            post_data = json.loads(request.httprequest.get_data().decode("utf-8"))
+        except ValueError:
+            return None
+        if not isinstance(post_data, dict):
+            return None
+        token = post_data.get("refresh_token")
+        return token if isinstance(token, str) and token else None
+
     @route(
         "/api/auth_jwt",
         type="http",
@@ -27,7 +55,8 @@ class JWTLoginController(Controller):
     def login(self):
         """Login endpoint.
         - Request body must be a JSON object with "login" and "password" keys.
-        - If login and password are correct, return a JSON object with a JWT token.
+        - If login and password are correct, return a JSON object with a JWT token
+          and a refresh token.
         - If login or password are missing, return a JSON object with an error.
         - If login or password are incorrect, return a JSON object with an error.
         """
@@ -41,44 +70,75 @@ class JWTLoginController(Controller):
                 password = post_data["password"]
                 uid = request.session.authenticate(request.session.db, login, password)
                 if uid is None:
-                    return Response(
-                        json.dumps({"error": "Invalid login or password."}),
-                        content_type="application/json",
-                        status=401,
-                    )
-                # Get validator
-                validator = request.env["auth.jwt.validator"]._get_validator_by_name(
-                    VALIDATOR_NAME
-                )
-                # Get Secret key
-                secret = validator.secret_key
-                if validator.secret_config_parameter_check:
-                    secret = (
-                        request.env["ir.config_parameter"]
-                        .sudo()
-                        .get_param("jwt_secret")
+                    return json_response(
+                        {"error": "Invalid login or password."}, status=401
                     )
-
-                # Get Expiration
-                expiration = int(
-                    request.env["ir.config_parameter"]
+                data.update(
+                    token=self._generate_token(uid, login),
+                    refresh_token=request.env["jwt.refresh.token"]
                     .sudo()
-                    .get_param("jwt_expiration", "3600")
+                    ._issue(request.env["res.users"].browse(uid)),
                 )
-                # Set Payload
-                payload = {
-                    "user_id": uid,
-                    "email": login,
-                }
-                # Generate Token
-                token = validator._encode(payload, secret, expiration)
-                data.update(token=token)
             else:
                 data.update(error="Missing email or password.")
         except Exception as e:
             data.update(error=str(e))
 
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
+
+    @route(
+        "/api/auth_jwt/refresh",
+        type="http",
+        auth="public",
+        cors="*",
+        save_session=False,
+        csrf=False,
+        methods=["POST"],
+    )
+    def refresh(self):
+        """Refresh endpoint.
+        - Request body must be a JSON object with a "refresh_token" key.
+        - If the refresh token is valid, return a JSON object with a new JWT
+          token and a new refresh token; the consumed refresh token is revoked.
+        - Otherwise, return a JSON object with an error.
+        - The password is not checked again, which makes this much cheaper
+          than a new login.
+        """
+        token = self._get_refresh_token()
+        if not token:
+            return json_response({"error": "Missing refresh token."}, status=400)
+        try:
+            user, refresh_token = request.env["jwt.refresh.token"].sudo()._rotate(token)
+        except AccessDenied:
+            return json_response({"error": "Invalid refresh token."}, status=401)
+        data = {
+            "token": self._generate_token(user.id, user.login),
+            "refresh_token": refresh_token,
+        }
+        return json_response(data)
+
+    @route(
+        "/api/auth_jwt/revoke",
+        type="http",
+        auth="public",
+        cors="*",
+        save_session=False,
+        csrf=False,
+        methods=["POST"],
+    )
+    def revoke(self):
+        """Refresh token revocation endpoint.
+        - Request body must be a JSON object with a "refresh_token" key.
+        - Revoke the refresh token and every token refreshed from it.
+        """
+        token = self._get_refresh_token()
+        if not token:
+            return json_response({"error": "Missing refresh token."}, status=400)
+        try:
+            request.env["jwt.refresh.token"].sudo()._revoke(token)
+        except AccessDenied:
+            return json_response({"error": "Invalid refresh token."}, status=401)
+        return json_response({})
 
     @route(
         "/api/auth_jwt/whoami",
@@ -97,6 +157,8 @@ class JWTLoginController(Controller):
         data = {}
         if getattr(request, "jwt_partner_id", None):
             partner = request.env["res.partner"].browse(request.jwt_partner_id)
-            data.update(name=partner.name, email=partner.email, uid=request.env.uid)
-        return Response(json.dumps(data), content_type="application/json", status=200)
-
+            data.update(
+                serialize("partner_detail", partner, fields=["name", "email"])[0]
+            )
+            data.update(uid=request.env.uid)
+        return json_response(data)
@@ -0,0 +1,39 @@
+"""Metrics controller for the JWT API."""
+
+import hmac
+
+from odoo.http import Controller, Response, request, route
+from odoo.tools import config
+
+from ..tools.metrics import api_metrics
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class JWTMetricsController(Controller):
+    """Controller to expose the API metrics.
+    - [GET] /metrics: get the metrics of all the workers.
+    """
+
+    @route(
+        "/api/metrics",
+        type="http",
+        auth="none",
+        csrf=False,
+        save_session=False,
+        methods=["GET"],
+    )
+    def get_metrics(self):
+        """Get the API metrics in the Prometheus text format.
+        - The endpoint is disabled unless the ``request_jwt_metrics_token``
+          server option is set, and the request must carry that token as a
+          bearer token.
+        - Metrics are aggregated over all the workers of the host.
+        """
+        token = config.get("request_jwt_metrics_token")
+        if not token:
+            return request.not_found()
+        auth_header = request.httprequest.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth_header, f"Bearer {token}"):
+            return Response("Unauthorized\n", status=401)
+        return Response(api_metrics.render(), content_type=PROMETHEUS_MIMETYPE)
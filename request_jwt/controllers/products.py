@@ -1,12 +1,62 @@
 """Controller to handle product records."""
 
-import json
+import functools
 
 from odoo.http import Controller, Response, request, route
 
+from ..tools import encoding
+from ..tools.catalog import catalog_cache, catalog_cache_key
+from .serializers import PRODUCT_FIELDS, serialize
+from .utils import (
+    ApiError,
+    cache_validators,
+    filter_on,
+    is_not_modified,
+    json_response,
+    not_modified_response,
+    paginate,
+    parse_bool,
+    parse_fields,
+    parse_filters,
+    parse_order,
+    search_records,
+    set_cache_validators,
+    stream_mode,
+    stream_response,
+    sync_changes,
+)
+
+PRODUCT_FILTERS = {
+    "categ_id": filter_on("categ_id", parse=int),
+    "default_code": filter_on("default_code"),
+    "sale_ok": filter_on("sale_ok", parse=parse_bool),
+}
+PRODUCT_ORDERS = {"id": "id", "name": "name", "default_code": "default_code"}
+
+
+def _product_changes(date):
+    # Names and prices are stored on the template.
+    return ["|", ("write_date", ">", date), ("product_tmpl_id.write_date", ">", date)]
+
 
 class JWTProductsController(Controller):
-    """Controller to handle product records."""
+    """Controller to handle product records.
+    - Responses carry an ETag and a Last-Modified date, and conditional
+      requests are answered with a ``304`` before any product is read.
+    - Serialized responses are kept in the catalog cache shared by all the
+      workers, and invalidated when a product or a template is written. A
+      response is only stored if the cache was not invalidated while it was
+      computed, and is keyed by its ETag: a response read from an older
+      snapshot is never served to a request that sees newer products.
+    """
+
+    def _cache_validators(self, products, domain, template_domain):
+        """Return the ETag and Last-Modified date of the matching products.
+        - Product names and prices are stored on the template, so template
+          writes change the validators too.
+        """
+        templates = request.env["product.template"].with_user(products.env.uid)
+        return cache_validators([(products, domain), (templates, template_domain)])
 
     @route(
         "/api/product",
@@ -17,24 +67,121 @@ class JWTProductsController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_products(self):
-        """Get all product records.
-        - Return a JSON object with a list of product records.
+    def get_products(
+        self, limit=None, after=None, stream=None, fields=None, order=None, **filters
+    ):
+        """Get a page of product records.
+        - ``limit`` is the page size and ``after`` the cursor of the previous page.
+        - ``fields`` is a comma separated list of the keys to return.
+        - Return a JSON object with a list of product records and the
+          ``next`` cursor, ``null`` on the last page.
+        - ``categ_id``, ``default_code`` and ``sale_ok`` (``1`` or ``0``)
+          filter the records.
+        - ``order`` sorts the records by a key of ``PRODUCT_ORDERS``, or
+          ``-key`` in descending order; they are sorted by id otherwise.
+        - With ``stream=1``, or when the client accepts ``application/x-ndjson``,
+          stream all the matching records after ``after``, sorted by id,
+          instead of a single page.
+        - Return an empty ``304`` response if the catalog did not change.
         """
         data = {}
-        products = request.env["product.product"].with_user(request.env.uid).search([])
-        data.update(
-            products=[
-                {
-                    "name": product.name,
-                    "price": product.list_price,
-                    "id": product.id,
-                    "description": product.description_sale or "N/A",
-                }
-                for product in products
-            ]
+        products = request.env["product.product"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+            domain = parse_filters(filters, PRODUCT_FILTERS)
+            order = parse_order(order, PRODUCT_ORDERS)
+            etag, last_modified = self._cache_validators(products, [], [])
+            if is_not_modified(etag, last_modified):
+                return not_modified_response(etag, last_modified)
+            mode = stream_mode(stream)
+            if mode:
+                serializer = functools.partial(serialize, "product", fields=fields)
+                response = stream_response(
+                    products, serializer, "products", mode, domain, after
+                )
+                return set_cache_validators(response, etag, last_modified)
+            key = catalog_cache_key(
+                products.env, "products", request.httprequest.query_string, etag
+            )
+            generation = catalog_cache.generation(products.env.cr.dbname)
+            body = catalog_cache.get(key)
+            if body is None:
+                products, next_cursor = paginate(
+                    products, domain, limit=limit, after=after, order=order
+                )
+                data.update(
+                    products=serialize("product", products, fields=fields),
+                    next=next_cursor,
+                )
+                body = encoding.dumps(data)
+                catalog_cache.set(products.env.cr.dbname, key, body, generation)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        response = Response(body, content_type="application/json", status=200)
+        return set_cache_validators(response, etag, last_modified)
+
+    @route(
+        "/api/product/search",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def search_products(self, q=None, limit=None, fields=None):
+        """Search product records by name or internal reference.
+        - ``q`` is the searched text, of at least 3 characters; prefixes,
+          substrings and, with ``pg_trgm``, misspelled words are matched.
+        - ``limit`` is the number of results, 10 by default and at most 50.
+        - ``fields`` is a comma separated list of the keys to return.
+        - Return a JSON object with the matching product records, best
+          matches first. Results are not cached.
+        """
+        products = request.env["product.product"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+            products = search_records(products, q, limit=limit)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        return json_response(
+            {"products": serialize("product", products, fields=fields)}
         )
-        return Response(json.dumps(data), content_type="application/json", status=200)
+
+    @route(
+        "/api/product/changes",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def get_product_changes(self, since=None, after=None, limit=None, fields=None):
+        """Get the product records changed since a sync token.
+        - ``since`` is the ``sync_token`` returned by the previous sync;
+          without it, every product record is returned.
+        - ``limit`` and ``after`` page through the changes, ``fields`` is a
+          comma separated list of the keys to return.
+        - Return a JSON object with the changed product records, the ids of the
+          ``deleted`` or archived ones, the ``next`` cursor and, on the last
+          page, the ``sync_token`` of the next sync.
+        """
+        products = request.env["product.product"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+            products, deleted, next_cursor, sync_token = sync_changes(
+                products, _product_changes, since=since, after=after, limit=limit
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        data = {
+            "products": serialize("product", products, fields=fields),
+            "deleted": deleted,
+            "next": next_cursor,
+            "sync_token": sync_token,
+        }
+        return json_response(data)
 
     @route(
         "/api/product/<int:product_id>",
@@ -45,29 +192,61 @@ class JWTProductsController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_product_by_id(self, product_id):
+    def get_product_by_id(self, product_id, fields=None):
         """Get a product record by id.
+        - ``fields`` is a comma separated list of the keys to return.
         - Return a JSON object with the product record.
+        - Return an empty ``304`` response if the product did not change.
         - Return a JSON object with an error if the product record is not found.
         """
         data = {}
-        product = (
-            request.env["product.product"].with_user(request.env.uid).browse(product_id)
+        try:
+            fields = parse_fields(fields, PRODUCT_FIELDS)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        products = request.env["product.product"].with_user(request.env.uid)
+        etag, last_modified = self._cache_validators(
+            products,
+            [("id", "=", product_id)],
+            [("product_variant_ids", "=", product_id)],
         )
-        if product:
-            data.update(
-                product={
-                    "name": product.name,
-                    "price": product.list_price,
-                    "id": product.id,
-                    "description": product.description_sale or "N/A",
-                }
-            )
-            return Response(
-                json.dumps(data), content_type="application/json", status=200
-            )
-        return Response(
-            json.dumps({"error": "Product not found."}),
-            content_type="application/json",
-            status=404,
+        if last_modified and is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified)
+        key = catalog_cache_key(
+            products.env,
+            "product",
+            product_id,
+            request.httprequest.query_string,
+            etag,
         )
+        generation = catalog_cache.generation(products.env.cr.dbname)
+        body = catalog_cache.get(key)
+        if body is None:
+            product = products.browse(product_id).exists()
+            if product:
+                data.update(product=serialize("product", product, fields=fields)[0])
+                body = encoding.dumps(data)
+                catalog_cache.set(products.env.cr.dbname, key, body, generation)
+        if body is not None:
+            response = Response(body, content_type="application/json", status=200)
+            return set_cache_validators(response, etag, last_modified)
+        return json_response({"error": "Product not found."}, status=404)
+
+    @route(
+        "/api/product/cache_stats",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def get_catalog_cache_stats(self):
+        """Get the usage statistics of the catalog cache.
+        - Return a JSON object with the hits, misses, evictions, invalidations,
+          hit ratio, number of entries and size in bytes of the cache.
+        - Return a ``403`` error unless the user is an administrator.
+        """
+        if not request.env.user.has_group("base.group_system"):
+            return json_response({"error": "Forbidden."}, status=403)
+        return json_response(catalog_cache.stats())
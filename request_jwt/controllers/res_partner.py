@@ -1,15 +1,55 @@
 """Controller to handle res.partner records."""
 
+import functools
 import json
 
-from odoo.http import Controller, Response, request, route
+from odoo.http import Controller, request, route
+
+from .serializers import (
+    PARTNER_DETAIL_FIELDS,
+    PARTNER_FIELDS,
+    serialize,
+)
+from .utils import (
+    ApiError,
+    bulk_create,
+    filter_on,
+    iter_request_rows,
+    json_response,
+    paginate,
+    parse_batch_size,
+    parse_bool,
+    parse_fields,
+    parse_filters,
+    parse_order,
+    read_replica,
+    search_records,
+    stream_mode,
+    stream_response,
+    sync_changes,
+)
+
+
+PARTNER_FILTERS = {
+    "is_company": filter_on("is_company", parse=parse_bool),
+    "country_id": filter_on("country_id", parse=int),
+    "email": filter_on("email"),
+}
+PARTNER_ORDERS = {"id": "id", "name": "name"}
+
+
+def _partner_changes(date):
+    return [("write_date", ">", date)]
 
 
 class JWTResPartnerController(Controller):
     """Controller to handle res.partner records.
-    - [GET] /res_partner: get all res.partner records.
+    - [GET] /res_partner: get a page of res.partner records.
+    - [GET] /res_partner/search: search res.partner records by text.
+    - [GET] /res_partner/changes: get the res.partner records changed since a sync.
     - [GET] /res_partner/<int:partner_id>: get a res.partner record by id.
     - [POST] /res_partner: create a res.partner record.
+    - [POST] /res_partner/bulk: create many res.partner records.
     """
 
     @route(
@@ -21,37 +61,112 @@ class JWTResPartnerController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_res_partner(self):
-        """Get all res.partner records.
-        - Return a JSON object with a list of res.partner records.
+    @read_replica
+    def get_res_partner(
+        self, limit=None, after=None, stream=None, fields=None, order=None, **filters
+    ):
+        """Get a page of res.partner records.
+        - ``limit`` is the page size and ``after`` the cursor of the previous page.
+        - ``fields`` is a comma separated list of the keys to return.
+        - Return a JSON object with a list of res.partner records and the
+          ``next`` cursor, ``null`` on the last page.
+        - ``is_company`` (``1`` or ``0``), ``country_id`` and ``email`` filter
+          the records.
+        - ``order`` sorts the records by a key of ``PARTNER_ORDERS``, or
+          ``-key`` in descending order; they are sorted by id otherwise.
+        - With ``stream=1``, or when the client accepts ``application/x-ndjson``,
+          stream all the matching records after ``after``, sorted by id,
+          instead of a single page.
         """
         data = {}
-        res_partner = request.env["res.partner"].with_user(request.env.uid).search([])
+        res_partner = request.env["res.partner"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PARTNER_FIELDS)
+            domain = parse_filters(filters, PARTNER_FILTERS)
+            mode = stream_mode(stream)
+            if mode:
+                serializer = functools.partial(serialize, "partner", fields=fields)
+                return stream_response(
+                    res_partner, serializer, "res_partner", mode, domain, after
+                )
+            res_partner, next_cursor = paginate(
+                res_partner,
+                domain,
+                limit=limit,
+                after=after,
+                order=parse_order(order, PARTNER_ORDERS),
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
         data.update(
-            res_partner=[
-                {
-                    "name": partner.name,
-                    "email": partner.email,
-                    "id": partner.id,
-                    "cnpj": partner.vat,
-                    "street": partner.street,
-                    "street2": partner.street2,
-                    "city": partner.city,
-                    "state": {
-                        "id": partner.state_id.id,
-                        "name": partner.state_id.name,
-                    },
-                    "country": {
-                        "id": partner.country_id.id,
-                        "name": partner.country_id.name,
-                    },
-                    "is_company": partner.is_company,
-                    "phone": partner.phone or "",
-                }
-                for partner in res_partner
-            ]
+            res_partner=serialize("partner", res_partner, fields=fields),
+            next=next_cursor,
         )
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
+
+    @route(
+        "/api/res_partner/search",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    @read_replica
+    def search_res_partner(self, q=None, limit=None, fields=None):
+        """Search res.partner records by name, email or CNPJ.
+        - ``q`` is the searched text, of at least 3 characters; prefixes,
+          substrings and, with ``pg_trgm``, misspelled words are matched.
+        - ``limit`` is the number of results, 10 by default and at most 50.
+        - ``fields`` is a comma separated list of the keys to return.
+        - Return a JSON object with the matching res.partner records, best
+          matches first.
+        """
+        res_partner = request.env["res.partner"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PARTNER_FIELDS)
+            res_partner = search_records(res_partner, q, limit=limit)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        return json_response(
+            {"res_partner": serialize("partner", res_partner, fields=fields)}
+        )
+
+    @route(
+        "/api/res_partner/changes",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def get_res_partner_changes(self, since=None, after=None, limit=None, fields=None):
+        """Get the res.partner records changed since a sync token.
+        - ``since`` is the ``sync_token`` returned by the previous sync;
+          without it, every res.partner record is returned.
+        - ``limit`` and ``after`` page through the changes, ``fields`` is a
+          comma separated list of the keys to return.
+        - Return a JSON object with the changed res.partner records, the ids of the
+          ``deleted`` or archived ones, the ``next`` cursor and, on the last
+          page, the ``sync_token`` of the next sync.
+        """
+        res_partner = request.env["res.partner"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, PARTNER_FIELDS)
+            res_partner, deleted, next_cursor, sync_token = sync_changes(
+                res_partner, _partner_changes, since=since, after=after, limit=limit
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        data = {
+            "res_partner": serialize("partner", res_partner, fields=fields),
+            "deleted": deleted,
+            "next": next_cursor,
+            "sync_token": sync_token,
+        }
+        return json_response(data)
 
     @route(
         "/api/res_partner/<int:partner_id>",
@@ -62,12 +177,18 @@ class JWTResPartnerController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_res_partner_by_id(self, partner_id):
+    @read_replica
+    def get_res_partner_by_id(self, partner_id, fields=None):
         """Get a res.partner record by id.
+        - ``fields`` is a comma separated list of the keys to return.
         - Return a JSON object with the res.partner record.
         - Return a JSON object with an error if the res.partner record is not found.
         """
         data = {}
+        try:
+            fields = parse_fields(fields, PARTNER_DETAIL_FIELDS)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
         res_partner = (
             request.env["res.partner"]
             .with_user(request.env.uid)
@@ -75,17 +196,11 @@ class JWTResPartnerController(Controller):
         )
         if res_partner:
             data.update(
-                res_partner={
-                    "name": res_partner.name,
-                    "email": res_partner.email,
-                    "id": res_partner.id,
-                    "address": res_partner.street or "N/A",
-                    "phone": res_partner.phone or "N/A",
-                }
+                res_partner=serialize("partner_detail", res_partner, fields=fields)[0]
             )
         else:
             data.update(error="Partner not found.")
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
 
     @route(
         "/api/res_partner",
@@ -104,28 +219,64 @@ class JWTResPartnerController(Controller):
         data = {}
         raw_data = request.httprequest.get_data()
         post_data = json.loads(raw_data.decode("utf-8"))
-        if "name" in post_data and "email" in post_data:
+        try:
+            vals = self._prepare_partner_vals(post_data)
+        except ApiError as e:
+            data.update(error=str(e))
+        else:
             res_partner = (
-                request.env["res.partner"]
-                .with_user(request.env.uid)
-                .create(
-                    {
-                        "name": post_data["name"],
-                        "email": post_data["email"],
-                        "street": post_data.get("address", ""),
-                        "phone": post_data.get("phone", ""),
-                    }
-                )
+                request.env["res.partner"].with_user(request.env.uid).create(vals)
             )
-            data.update(
-                res_partner={
-                    "name": res_partner.name,
-                    "email": res_partner.email,
-                    "id": res_partner.id,
-                    "address": res_partner.street or "N/A",
-                    "phone": res_partner.phone or "N/A",
-                }
+            data.update(res_partner=serialize("partner_detail", res_partner)[0])
+        return json_response(data)
+
+    @route(
+        "/api/res_partner/bulk",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["POST", "OPTIONS"],
+    )
+    def create_res_partner_bulk(self, batch_size=None):
+        """Create many res.partner records.
+        - Request body must be a JSON array of partners, or one partner per
+          line with the ``application/x-ndjson`` content type; each partner
+          has the same keys as for a single creation.
+        - Partners are created by batches of ``batch_size``.
+        - Return a JSON object with the result of each partner, in order: its
+          ``index`` in the request and either its ``id`` or an ``error``.
+        """
+        try:
+            batch_size = parse_batch_size(batch_size)
+            results = bulk_create(
+                request.env["res.partner"].with_user(request.env.uid),
+                iter_request_rows(),
+                self._prepare_partner_vals,
+                batch_size,
             )
-        else:
-            data.update(error="Missing name or email.")
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        errors = sum(1 for result in results if "error" in result)
+        data = {
+            "res_partner": results,
+            "created": len(results) - errors,
+            "errors": errors,
+        }
+        return json_response(data)
+
+    def _prepare_partner_vals(self, post_data):
+        """Return the values to create a partner from its JSON representation.
+        - Raise an ``ApiError`` if the name or email is missing.
+        """
+        if not isinstance(post_data, dict):
+            raise ApiError("Invalid partner.")
+        if "name" not in post_data or "email" not in post_data:
+            raise ApiError("Missing name or email.")
+        return {
+            "name": post_data["name"],
+            "email": post_data["email"],
+            "street": post_data.get("address", ""),
+            "phone": post_data.get("phone", ""),
+        }
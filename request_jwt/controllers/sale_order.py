@@ -1,15 +1,76 @@
 """Controller for the sale order model."""
 
+import functools
 import json
 
+from odoo import api
+from odoo.fields import Datetime
 from odoo.http import Controller, Response, request, route
 
+from ..tools import encoding
+from .serializers import SALE_ORDER_FIELDS, serialize
+from .utils import (
+    NDJSON_MIMETYPE,
+    ApiError,
+    bulk_create,
+    filter_on,
+    iter_batches,
+    iter_ndjson,
+    json_response,
+    paginate,
+    parse_batch_size,
+    parse_date_to,
+    parse_fields,
+    parse_filters,
+    parse_list,
+    parse_order,
+    parse_positive_int,
+    read_replica,
+    stream_mode,
+    stream_response,
+    sync_changes,
+)
+
+DEFAULT_COMMIT_EVERY = 10
+MAX_COMMIT_EVERY = 1000
+SALE_ORDER_FILTERS = {
+    "partner_id": filter_on("partner_id", parse=int),
+    "state": filter_on("state", "in", parse_list),
+    "date_from": filter_on("date_order", ">=", Datetime.to_datetime),
+    "date_to": filter_on("date_order", "<", parse_date_to),
+}
+EXPORT_FORMATS = ("ndjson", "csv")
+# Bodies parsed by Odoo before the endpoint runs.
+FORM_MIMETYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+SALE_ORDER_ORDERS = {
+    "id": "id",
+    "name": "name",
+    "date": "date_order",
+    "amount_total": "amount_total",
+}
+
+
+def _is_id(value):
+    """Return whether ``value`` of a JSON payload is a record id."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _ndjson_lines(items):
+    return b"".join(encoding.dumps(item) + b"\n" for item in items)
+
+
+def _sale_order_changes(date):
+    return ["|", ("write_date", ">", date), ("order_line.write_date", ">", date)]
+
 
 class JWTSaleOrderController(Controller):
     """Controller to handle sale order records.
-    - [GET] /sale_order: get all sale order records.
+    - [GET] /sale_order: get a page of sale order records.
+    - [GET] /sale_order/changes: get the sale order records changed since a sync.
     - [GET] /sale_order/<int:order_id>: get a sale order record by id.
     - [POST] /sale_order: create a sale order record.
+    - [POST] /sale_order/ingest: create sale order records from a stream.
+    - [POST] /sale_order/export: export sale order records in the background.
     """
 
     @route(
@@ -21,36 +82,83 @@ class JWTSaleOrderController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_sale_order(self):
-        """Get all sale order records.
-        - Return a JSON object with a list of sale order records.
+    @read_replica
+    def get_sale_order(
+        self, limit=None, after=None, stream=None, fields=None, order=None, **filters
+    ):
+        """Get a page of sale order records.
+        - ``limit`` is the page size and ``after`` the cursor of the previous page.
+        - ``fields`` is a comma separated list of the keys to return.
+        - Return a JSON object with a list of sale order records and the
+          ``next`` cursor, ``null`` on the last page.
+        - ``partner_id``, ``state`` (comma separated), ``date_from`` and
+          ``date_to`` filter the records; a ``date_to`` date includes the day.
+        - ``order`` sorts the records by a key of ``SALE_ORDER_ORDERS``, or
+          ``-key`` in descending order; they are sorted by id otherwise.
+        - With ``stream=1``, or when the client accepts ``application/x-ndjson``,
+          stream all the matching records after ``after``, sorted by id,
+          instead of a single page.
         """
         data = {}
-        sale_order = request.env["sale.order"].with_user(request.env.uid).search([])
+        sale_order = request.env["sale.order"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, SALE_ORDER_FIELDS)
+            domain = parse_filters(filters, SALE_ORDER_FILTERS)
+            mode = stream_mode(stream)
+            if mode:
+                serializer = functools.partial(serialize, "sale_order", fields=fields)
+                return stream_response(
+                    sale_order, serializer, "sale_order", mode, domain, after
+                )
+            sale_order, next_cursor = paginate(
+                sale_order,
+                domain,
+                limit=limit,
+                after=after,
+                order=parse_order(order, SALE_ORDER_ORDERS),
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
         data.update(
-            sale_order=[
-                {
-                    "name": order.name,
-                    "date": str(order.date_order),
-                    "id": order.id,
-                    "partner_id": order.partner_id.id,
-                    "amount_total": order.amount_total,
-                    "state": order.state or "N/A",
-                    "lines": [
-                        {
-                            "id": line.id,
-                            "product_id": line.product_id.id,
-                            "product_name": line.product_id.name,
-                            "quantity": line.product_uom_qty,
-                            "price": line.price_unit,
-                        }
-                        for line in order.order_line
-                    ],
-                }
-                for order in sale_order
-            ]
+            sale_order=serialize("sale_order", sale_order, fields=fields),
+            next=next_cursor,
         )
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
+
+    @route(
+        "/api/sale_order/changes",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["GET", "OPTIONS"],
+    )
+    def get_sale_order_changes(self, since=None, after=None, limit=None, fields=None):
+        """Get the sale order records changed since a sync token.
+        - ``since`` is the ``sync_token`` returned by the previous sync;
+          without it, every sale order record is returned.
+        - ``limit`` and ``after`` page through the changes, ``fields`` is a
+          comma separated list of the keys to return.
+        - Return a JSON object with the changed sale order records, the ids of the
+          ``deleted`` or archived ones, the ``next`` cursor and, on the last
+          page, the ``sync_token`` of the next sync.
+        """
+        sale_order = request.env["sale.order"].with_user(request.env.uid)
+        try:
+            fields = parse_fields(fields, SALE_ORDER_FIELDS)
+            sale_order, deleted, next_cursor, sync_token = sync_changes(
+                sale_order, _sale_order_changes, since=since, after=after, limit=limit
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        data = {
+            "sale_order": serialize("sale_order", sale_order, fields=fields),
+            "deleted": deleted,
+            "next": next_cursor,
+            "sync_token": sync_token,
+        }
+        return json_response(data)
 
     @route(
         "/api/sale_order/<int:order_id>",
@@ -61,39 +169,31 @@ class JWTSaleOrderController(Controller):
         save_session=False,
         methods=["GET", "OPTIONS"],
     )
-    def get_sale_order_by_id(self, order_id):
+    @read_replica
+    def get_sale_order_by_id(self, order_id, fields=None):
         """Get a sale order record by id.
+        - ``fields`` is a comma separated list of the keys to return.
         - Return a JSON object with the sale order record.
         - Return a JSON object with an error if the sale order record is not found.
         """
         data = {}
+        try:
+            fields = parse_fields(fields, SALE_ORDER_FIELDS)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
         sale_order = (
-            request.env["sale.order"].with_user(request.env.uid).browse(order_id)
+            request.env["sale.order"]
+            .with_user(request.env.uid)
+            .browse(order_id)
+            .exists()
         )
         if sale_order:
             data.update(
-                sale_order={
-                    "name": sale_order.name,
-                    "date": str(sale_order.date_order),
-                    "id": sale_order.id,
-                    "partner_id": sale_order.partner_id.id,
-                    "amount_total": sale_order.amount_total,
-                    "state": sale_order.state or "N/A",
-                    "lines": [
-                        {
-                            "id": line.id,
-                            "product_id": line.product_id.id,
-                            "product_name": line.product_id.name,
-                            "quantity": line.product_uom_qty,
-                            "price": line.price_unit,
-                        }
-                        for line in sale_order.order_line
-                    ],
-                }
+                sale_order=serialize("sale_order", sale_order, fields=fields)[0]
             )
         else:
             data.update({"error": "Sale order not found."})
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
 
     @route(
         "/api/sale_order",
@@ -115,47 +215,167 @@ class JWTSaleOrderController(Controller):
             sale_order = (
                 request.env["sale.order"]
                 .with_user(request.env.uid)
-                .create(
-                    {
-                        "name": payload.get("name"),
-                        "date_order": payload.get("date"),
-                        "partner_id": payload.get("partner_id"),
-                        "amount_total": payload.get("amount_total"),
-                        "order_line": [
-                            (
-                                0,
-                                0,
-                                {
-                                    "product_id": line.get("product_id"),
-                                    "product_uom_qty": line.get("quantity"),
-                                    "price_unit": line.get("price"),
-                                },
-                            )
-                            for line in payload.get("lines")
-                        ],
-                    }
-                )
-            )
-            data.update(
-                sale_order={
-                    "name": sale_order.name,
-                    "date": str(sale_order.date_order),
-                    "id": sale_order.id,
-                    "partner_id": sale_order.partner_id.id,
-                    "amount_total": sale_order.amount_total,
-                    "state": sale_order.state or "N/A",
-                    "lines": [
-                        {
-                            "id": line.id,
-                            "product_id": line.product_id.id,
-                            "product_name": line.product_id.name,
-                            "quantity": line.product_uom_qty,
-                            "price": line.price_unit,
-                        }
-                        for line in sale_order.order_line
-                    ],
-                }
+                .create(self._prepare_order_vals(payload))
             )
+            data.update(sale_order=serialize("sale_order", sale_order)[0])
         except Exception as e:
             data.update({"error": str(e)})
-        return Response(json.dumps(data), content_type="application/json", status=200)
+        return json_response(data)
+
+    @route(
+        "/api/sale_order/ingest",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["POST", "OPTIONS"],
+    )
+    def ingest_sale_orders(self, batch_size=None, commit_every=None):
+        """Create sale order records from a stream.
+        - Request body must hold one sale order per line, with the same keys
+          as for a single creation (``application/x-ndjson``); form bodies
+          get a ``415`` error.
+        - Orders are created by batches of ``batch_size``, and the
+          transaction is committed every ``commit_every`` batches.
+        - Return one JSON line per order, in order: its ``index`` in the
+          request and either its ``id`` or an ``error``. Results are only
+          sent once their orders are committed.
+        """
+        try:
+            batch_size = parse_batch_size(batch_size)
+            commit_every = parse_positive_int(
+                commit_every, DEFAULT_COMMIT_EVERY, MAX_COMMIT_EVERY, "commit_every"
+            )
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        httprequest = request.httprequest
+        if httprequest.mimetype in FORM_MIMETYPES:
+            return json_response(
+                {"error": f"The request body must be {NDJSON_MIMETYPE}."}, status=415
+            )
+        env = request.env
+        # The body is read while the response is sent, so that neither is held
+        # in memory. The WSGI server keeps the input open until the response
+        # is written, and Odoo only consumes form bodies before the endpoint,
+        # which are refused above.
+        lines = httprequest.stream
+        registry, uid, context = env.registry, env.uid, dict(env.context)
+
+        def generate():
+            # The body is produced once the request cursor is closed.
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                pending = []
+                rows = enumerate(iter_ndjson(lines))
+                for number, batch in enumerate(iter_batches(rows, batch_size), 1):
+                    pending += self._ingest_batch(env, batch)
+                    if number % commit_every == 0:
+                        cr.commit()
+                        yield _ndjson_lines(pending)
+                        pending = []
+                        env.invalidate_all()
+                cr.commit()
+                if pending:
+                    yield _ndjson_lines(pending)
+
+        return Response(generate(), content_type=NDJSON_MIMETYPE, status=200)
+
+    @route(
+        "/api/sale_order/export",
+        type="http",
+        auth="jwt_api",
+        csrf=False,
+        cors="*",
+        save_session=False,
+        methods=["POST", "OPTIONS"],
+    )
+    def export_sale_orders(self, **params):
+        """Export sale order records with their lines in the background.
+        - ``format`` is ``ndjson``, the default, or ``csv``, with one row per
+          line; the filters of the list endpoint select the orders.
+        - Return a ``202`` response with the export job, whose state is then
+          read from ``/api/export/<id>``, given by the ``Location`` header.
+        """
+        file_format = params.pop("format", None) or "ndjson"
+        try:
+            if file_format not in EXPORT_FORMATS:
+                raise ApiError("Invalid format.")
+            domain = parse_filters(params, SALE_ORDER_FILTERS)
+        except ApiError as e:
+            return json_response({"error": str(e)}, status=e.status)
+        job = request.env["api.export.job"]._enqueue(
+            request.env.user, "sale.order", "sale_order", domain, file_format
+        )
+        response = json_response({"export": job._get_status()}, status=202)
+        response.headers["Location"] = f"/api/export/{job.id}"
+        return response
+
+    def _prepare_order_vals(self, payload):
+        """Return the values to create a sale order from its JSON representation."""
+        lines = isinstance(payload, dict) and payload.get("lines")
+        if not isinstance(lines, list) or not all(
+            isinstance(line, dict) for line in lines
+        ):
+            raise ApiError("Invalid sale order.")
+        return {
+            "name": payload.get("name"),
+            "date_order": payload.get("date"),
+            "partner_id": payload.get("partner_id"),
+            "amount_total": payload.get("amount_total"),
+            "order_line": [
+                (
+                    0,
+                    0,
+                    {
+                        "product_id": line.get("product_id"),
+                        "product_uom_qty": line.get("quantity"),
+                        "price_unit": line.get("price"),
+                    },
+                )
+                for line in payload.get("lines")
+            ],
+        }
+
+    def _ingest_batch(self, env, batch):
+        """Create the sale orders of ``batch``, a list of ``(index, row)``.
+        - The partners and products of the whole batch are checked with one
+          query each before creating the orders.
+        - Return the result of each order, with its index in the stream.
+        """
+        rows = [row for _index, row in batch]
+        partner_ids, product_ids = set(), set()
+        for row in rows:
+            if isinstance(row, dict):
+                partner_ids.add(row.get("partner_id"))
+                for line in row.get("lines") or []:
+                    if isinstance(line, dict):
+                        product_ids.add(line.get("product_id"))
+        partners = set(
+            env["res.partner"]
+            .search([("id", "in", [i for i in partner_ids if _is_id(i)])])
+            .ids
+        )
+        products = set(
+            env["product.product"]
+            .search([("id", "in", [i for i in product_ids if _is_id(i)])])
+            .ids
+        )
+
+        def prepare_vals(row):
+            if isinstance(row, ApiError):
+                raise row
+            vals = self._prepare_order_vals(row)
+            # True and False would match the ids 1 and 0 of the sets.
+            if not _is_id(vals["partner_id"]) or vals["partner_id"] not in partners:
+                raise ApiError("Unknown partner %s." % vals["partner_id"])
+            for _command, _id, line_vals in vals["order_line"]:
+                product_id = line_vals["product_id"]
+                if not _is_id(product_id) or product_id not in products:
+                    raise ApiError("Unknown product %s." % line_vals["product_id"])
+            return vals
+
+        results = bulk_create(env["sale.order"], rows, prepare_vals, len(rows))
+        for result in results:
+            result["index"] = batch[result["index"]][0]
+        return results
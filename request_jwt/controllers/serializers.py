@@ -0,0 +1,284 @@
+"""Batched serializers shared by the JWT API controllers.
+
+Each ``*_FIELDS`` mapping is the whitelist of the keys a client can ask for
+with ``?fields=``, mapped to the ORM fields that must be read to build them.
+Serializers are registered in ``SERIALIZERS`` by name and return plain
+values, dates included; encoding them is left to ``tools.encoding``.
+"""
+
+import time
+
+from ..tools import metrics
+
+PRODUCT_FIELDS = {
+    "name": ["name"],
+    "price": ["list_price"],
+    "id": [],
+    "description": ["description_sale"],
+}
+PARTNER_FIELDS = {
+    "name": ["name"],
+    "email": ["email"],
+    "id": [],
+    "cnpj": ["vat"],
+    "street": ["street"],
+    "street2": ["street2"],
+    "city": ["city"],
+    "state": ["state_id"],
+    "country": ["country_id"],
+    "is_company": ["is_company"],
+    "phone": ["phone"],
+}
+PARTNER_DETAIL_FIELDS = {
+    "name": ["name"],
+    "email": ["email"],
+    "id": [],
+    "address": ["street"],
+    "phone": ["phone"],
+}
+SALE_ORDER_FIELDS = {
+    "name": ["name"],
+    "date": ["date_order"],
+    "id": [],
+    "partner_id": ["partner_id"],
+    "amount_total": ["amount_total"],
+    "state": ["state"],
+    "lines": ["order_line"],
+}
+SALE_ORDER_LINE_FIELDS = ["product_id", "product_uom_qty", "price_unit"]
+# Columns of api.sale.order.summary read for the keys of SALE_ORDER_FIELDS.
+SALE_ORDER_SUMMARY_FIELDS = {
+    "name": ["name"],
+    "date": ["date_order"],
+    "id": [],
+    "partner_id": ["partner_id"],
+    "amount_total": ["amount_total"],
+    "state": ["state"],
+    "lines": ["lines"],
+}
+
+SERIALIZERS = {}
+
+
+class Serializer:
+    """Serializer of the records of ``model``.
+    - ``fields`` is the whitelist of the keys it can return.
+    - Calling it with a recordset and the requested keys returns a list of
+      dicts, in the order of the records; the time spent is recorded as the
+      ``serialize`` phase of the request.
+    """
+
+    def __init__(self, name, model, fields, func):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.func = func
+
+    def __call__(self, records, fields=None):
+        start = time.perf_counter()
+        data = self.func(records, fields=fields)
+        metrics.record("serialize", time.perf_counter() - start)
+        return data
+
+
+def register(name, model, fields):
+    """Register the decorated function as the serializer ``name``.
+    - The function is replaced by its ``Serializer``.
+    """
+
+    def decorator(func):
+        SERIALIZERS[name] = Serializer(name, model, fields, func)
+        return SERIALIZERS[name]
+
+    return decorator
+
+
+def serialize(name, records, fields=None):
+    """Serialize ``records`` with the serializer registered as ``name``."""
+    return SERIALIZERS[name](records, fields=fields)
+
+
+def _orm_fields(whitelist, keys):
+    """Return the ORM fields to read to build ``keys``."""
+    return list({name: None for key in keys for name in whitelist[key]}) or ["id"]
+
+
+def _read_names(model, ids):
+    """Return a ``{id: name}`` mapping read with a single query."""
+    return {row["id"]: row["name"] for row in model.browse(list(ids)).read(["name"])}
+
+
+def _serialize(rows, keys, getters):
+    return [{key: getters[key](row) for key in keys} for row in rows]
+
+
+@register("product", "product.product", PRODUCT_FIELDS)
+def serialize_products(products, fields=None):
+    """Serialize products with a single ``read``.
+    - ``fields`` is the list of keys to return, all of ``PRODUCT_FIELDS``
+      by default; only the matching columns are read.
+    - Return a list of dicts, in the order of ``products``.
+    """
+    keys = fields or list(PRODUCT_FIELDS)
+    rows = products.read(_orm_fields(PRODUCT_FIELDS, keys))
+    getters = {
+        "name": lambda row: row["name"],
+        "price": lambda row: row["list_price"],
+        "id": lambda row: row["id"],
+        "description": lambda row: row["description_sale"] or "N/A",
+    }
+    return _serialize(rows, keys, getters)
+
+
+@register("partner", "res.partner", PARTNER_FIELDS)
+def serialize_partners(partners, fields=None):
+    """Serialize partners with their state and country.
+    - ``fields`` is the list of keys to return, all of ``PARTNER_FIELDS``
+      by default; only the matching columns are read.
+    - States and countries names are read once for the whole batch, and
+      only when requested.
+    - Return a list of dicts, in the order of ``partners``.
+    """
+    env = partners.env
+    keys = fields or list(PARTNER_FIELDS)
+    rows = partners.read(_orm_fields(PARTNER_FIELDS, keys), load=None)
+    states = countries = {}
+    if "state" in keys:
+        states = _read_names(
+            env["res.country.state"],
+            {row["state_id"] for row in rows if row["state_id"]},
+        )
+    if "country" in keys:
+        countries = _read_names(
+            env["res.country"],
+            {row["country_id"] for row in rows if row["country_id"]},
+        )
+    getters = {
+        "name": lambda row: row["name"],
+        "email": lambda row: row["email"],
+        "id": lambda row: row["id"],
+        "cnpj": lambda row: row["vat"],
+        "street": lambda row: row["street"],
+        "street2": lambda row: row["street2"],
+        "city": lambda row: row["city"],
+        "state": lambda row: {
+            "id": row["state_id"],
+            "name": states.get(row["state_id"], False),
+        },
+        "country": lambda row: {
+            "id": row["country_id"],
+            "name": countries.get(row["country_id"], False),
+        },
+        "is_company": lambda row: row["is_company"],
+        "phone": lambda row: row["phone"] or "",
+    }
+    return _serialize(rows, keys, getters)
+
+
+@register("partner_detail", "res.partner", PARTNER_DETAIL_FIELDS)
+def serialize_partner_details(partners, fields=None):
+    """Serialize partners in the short shape of the single partner endpoints.
+    - ``fields`` is the list of keys to return, all of
+      ``PARTNER_DETAIL_FIELDS`` by default.
+    - Return a list of dicts, in the order of ``partners``.
+    """
+    keys = fields or list(PARTNER_DETAIL_FIELDS)
+    rows = partners.read(_orm_fields(PARTNER_DETAIL_FIELDS, keys))
+    getters = {
+        "name": lambda row: row["name"],
+        "email": lambda row: row["email"],
+        "id": lambda row: row["id"],
+        "address": lambda row: row["street"] or "N/A",
+        "phone": lambda row: row["phone"] or "N/A",
+    }
+    return _serialize(rows, keys, getters)
+
+
+@register("sale_order", "sale.order", SALE_ORDER_FIELDS)
+def serialize_sale_orders(orders, fields=None):
+    """Serialize sale orders with their lines.
+    - ``fields`` is the list of keys to return, all of ``SALE_ORDER_FIELDS``
+      by default.
+    - Orders are read from their ``api.sale.order.summary`` with a single
+      query, lines and product names included; orders without an up to date
+      summary are read from the ORM by ``_serialize_sale_orders``.
+    - Return a list of dicts, in the order of ``orders``.
+    """
+    env = orders.env
+    keys = fields or list(SALE_ORDER_FIELDS)
+    summaries = env["api.sale.order.summary"]._read_summaries(
+        orders, ["order_id"] + _orm_fields(SALE_ORDER_SUMMARY_FIELDS, keys)
+    )
+    lang = env.lang or "en_US"
+    getters = {
+        "name": lambda row: row["name"],
+        "date": lambda row: row["date_order"],
+        "id": lambda row: row["order_id"],
+        "partner_id": lambda row: row["partner_id"],
+        "amount_total": lambda row: row["amount_total"],
+        "state": lambda row: row["state"] or "N/A",
+        "lines": lambda row: [
+            {
+                "id": line["id"],
+                "product_id": line["product_id"] or False,
+                "product_name": _translate(line["product_name"], lang),
+                "quantity": line["quantity"],
+                "price": line["price"],
+            }
+            for line in row["lines"]
+        ],
+    }
+    items = dict(zip(summaries, _serialize(summaries.values(), keys, getters)))
+    missing = orders.browse([id_ for id_ in orders.ids if id_ not in items])
+    if missing:
+        items.update(zip(missing.ids, _serialize_sale_orders(missing, keys)))
+    return [items[order_id] for order_id in orders.ids]
+
+
+def _translate(value, lang):
+    """Return the ``lang`` translation of a translated column value."""
+    if not value:
+        return False
+    return value.get(lang) or value.get("en_US", False)
+
+
+def _serialize_sale_orders(orders, keys):
+    """Serialize sale orders from the ORM.
+    - Headers, lines and product names are each fetched with one set-based
+      ``read`` over all the ids, so the number of queries does not depend on
+      the number of orders or lines.
+    """
+    env = orders.env
+    order_rows = orders.read(_orm_fields(SALE_ORDER_FIELDS, keys), load=None)
+    lines = product_names = {}
+    if "lines" in keys:
+        line_ids = [line_id for row in order_rows for line_id in row["order_line"]]
+        lines = {
+            row["id"]: row
+            for row in env["sale.order.line"]
+            .browse(line_ids)
+            .read(SALE_ORDER_LINE_FIELDS, load=None)
+        }
+        product_names = _read_names(
+            env["product.product"],
+            {row["product_id"] for row in lines.values() if row["product_id"]},
+        )
+    getters = {
+        "name": lambda row: row["name"],
+        "date": lambda row: row["date_order"],
+        "id": lambda row: row["id"],
+        "partner_id": lambda row: row["partner_id"],
+        "amount_total": lambda row: row["amount_total"],
+        "state": lambda row: row["state"] or "N/A",
+        "lines": lambda row: [
+            {
+                "id": line_id,
+                "product_id": lines[line_id]["product_id"],
+                "product_name": product_names.get(lines[line_id]["product_id"], False),
+                "quantity": lines[line_id]["product_uom_qty"],
+                "price": lines[line_id]["price_unit"],
+            }
+            for line_id in row["order_line"]
+        ],
+    }
+    return _serialize(order_rows, keys, getters)
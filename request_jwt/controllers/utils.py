@@ -0,0 +1,579 @@
+"""Shared helpers for the JWT API controllers."""
+
+import base64
+import binascii
+import datetime
+import functools
+import hashlib
+import itertools
+import json
+
+from odoo import api
+from odoo.fields import Date, Datetime
+from odoo.http import Response, request
+
+from ..tools import encoding
+from ..tools.compression import ENCODINGS
+from ..tools.replica import replica
+from ..tools.search import ranked_search
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_BATCH_SIZE = 500
+# Changes are looked up this long before the sync token, so that records
+# written by transactions still running when the token was issued are not
+# missed. Clients receive them twice and must apply changes idempotently.
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+NDJSON_MIMETYPE = "application/x-ndjson"
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Shorter queries have no trigram in common with the indexes.
+SEARCH_MIN_LENGTH = 3
+
+
+class ApiError(Exception):
+    """Error raised by a helper and returned to the client as a JSON error.
+    - ``status`` is the HTTP status code of the error response.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(data, status=200):
+    """Return ``data`` as a JSON response, encoded by ``tools.encoding``."""
+    body = encoding.dumps(data)
+    return Response(body, content_type="application/json", status=status)
+
+
+def read_replica(func):
+    """Run the decorated endpoint on the read replica when it is available.
+    - Only ``GET`` requests are routed, in a read-only transaction: the
+      endpoint must not write, and may read data a few seconds old.
+    - ``request.env`` is bound to the replica cursor while the endpoint runs,
+      authentication having been done on the primary database.
+    - Streamed responses of the endpoint read the replica too, see
+      ``stream_response``.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if request.httprequest.method != "GET":
+            return func(*args, **kwargs)
+        env = request.env
+        cr = replica.cursor(env.cr.dbname)
+        if cr is None:
+            return func(*args, **kwargs)
+        request.env = api.Environment(cr, env.uid, env.context, env.su)
+        request.api_replica = True
+        try:
+            with cr:
+                return func(*args, **kwargs)
+        finally:
+            request.env = env
+            request.api_replica = False
+
+    return wrapper
+
+
+def encode_cursor(values):
+    """Encode the position of the last record of a page as an opaque cursor."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_token(token):
+    """Decode a cursor or a token built by ``encode_cursor``.
+    - Raise an ``ApiError`` if the token is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        raise ApiError("Invalid cursor.") from None
+    if not isinstance(values, dict):
+        raise ApiError("Invalid cursor.")
+    return values
+
+
+def decode_cursor(cursor):
+    """Decode a cursor built by ``encode_cursor``.
+    - Raise an ``ApiError`` if the cursor is malformed.
+    """
+    values = decode_token(cursor)
+    try:
+        values["id"] = int(values["id"])
+    except (ValueError, TypeError, KeyError):
+        raise ApiError("Invalid cursor.") from None
+    return values
+
+
+def parse_positive_int(value, default, maximum, label):
+    """Return the positive integer ``value`` of a query parameter.
+    - Return ``default`` when the parameter is missing and at most
+      ``maximum``; raise an ``ApiError`` mentioning ``label`` when invalid.
+    """
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(f"Invalid {label}.") from None
+    if value < 1:
+        raise ApiError(f"Invalid {label}.")
+    return min(value, maximum)
+
+
+def parse_limit(limit):
+    """Return the page size requested by the client, bounded by ``MAX_LIMIT``."""
+    return parse_positive_int(limit, DEFAULT_LIMIT, MAX_LIMIT, "limit")
+
+
+def parse_fields(fields, whitelist):
+    """Return the keys requested with the ``fields`` query parameter.
+    - ``fields`` is a comma separated list of keys of ``whitelist``.
+    - Return ``None`` when no fields are requested, the keys in whitelist
+      order otherwise, and raise an ``ApiError`` on unknown keys.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(whitelist)
+    if unknown:
+        raise ApiError("Unknown fields: %s." % ", ".join(sorted(unknown)))
+    return [key for key in whitelist if key in requested]
+
+
+def parse_batch_size(batch_size):
+    """Return the batch size requested by the client, at most ``MAX_BATCH_SIZE``."""
+    return parse_positive_int(
+        batch_size, DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, "batch size"
+    )
+
+
+def parse_bool(value):
+    """Return the boolean of a ``1``/``true`` or ``0``/``false`` parameter."""
+    value = value.strip().lower()
+    if value not in ("1", "true", "0", "false"):
+        raise ValueError(value)
+    return value in ("1", "true")
+
+
+def parse_list(value):
+    """Return the values of a comma separated parameter."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_date_to(value):
+    """Return the end, excluded, of a ``date_to`` parameter.
+    - A date alone includes the whole day.
+    """
+    date_to = Datetime.to_datetime(value)
+    if len(value) <= 10:
+        date_to += datetime.timedelta(days=1)
+    return date_to
+
+
+def filter_on(field, operator="=", parse=str):
+    """Return a filter of ``parse_filters`` comparing ``field`` to the value."""
+
+    def get_domain(value):
+        return [(field, operator, parse(value))]
+
+    return get_domain
+
+
+def parse_filters(params, filters):
+    """Return the domain of the filter parameters of a list request.
+    - ``filters`` maps the accepted parameters to a function returning the
+      domain of their value, see ``filter_on``; other parameters are ignored.
+    - Raise an ``ApiError`` if a value is invalid.
+    """
+    domain = []
+    for key, get_domain in filters.items():
+        value = params.get(key)
+        if value in (None, ""):
+            continue
+        try:
+            domain += get_domain(value)
+        except (TypeError, ValueError):
+            raise ApiError(f"Invalid {key}.") from None
+    return domain
+
+
+def parse_order(order, orders):
+    """Return the ORM field and the direction requested by ``order``.
+    - ``order`` is a key of ``orders``, which maps the accepted keys to ORM
+      fields, prefixed with ``-`` for a descending order.
+    - Return ``None`` when no order is requested and raise an ``ApiError`` on
+      unknown keys.
+    """
+    if not order:
+        return None
+    order = order.strip()
+    descending = order.startswith("-")
+    key = order[1:] if descending else order
+    if key not in orders:
+        raise ApiError(f"Unknown order: {key}.")
+    return orders[key], descending
+
+
+def _keyset_domain(model, order, cursor):
+    """Return the domain of the records sorted after ``cursor``.
+    - ``order`` is the ``(field, descending)`` pair of ``parse_order``; ``id``
+      breaks the ties, in the same direction.
+    - PostgreSQL sorts NULL values last in ascending order and first in
+      descending order, which is handled for optional fields only.
+    """
+    name, descending = order
+    operator = "<" if descending else ">"
+    value, last_id = cursor.get("value"), cursor["id"]
+    if value is None:
+        if descending:
+            return [
+                "|",
+                (name, "!=", False),
+                "&",
+                (name, "=", False),
+                ("id", "<", last_id),
+            ]
+        return [(name, "=", False), ("id", ">", last_id)]
+    domain = [
+        "|",
+        (name, operator, value),
+        "&",
+        (name, "=", value),
+        ("id", operator, last_id),
+    ]
+    if not descending and not model._fields[name].required:
+        domain = ["|"] + domain + [(name, "=", False)]
+    return domain
+
+
+def _keyset_value(record, name):
+    """Return the value of ``name`` of ``record`` to store in a cursor."""
+    field = record._fields[name]
+    value = record[name]
+    if field.type == "datetime":
+        return Datetime.to_string(value) if value else None
+    if field.type == "date":
+        return Date.to_string(value) if value else None
+    if value is False and field.type != "boolean":
+        return None
+    return value
+
+
+def search_records(model, q, limit=None):
+    """Return the ``model`` records best matching the search query ``q``.
+    - ``q`` must have at least ``SEARCH_MIN_LENGTH`` characters; at most
+      ``limit`` records are returned, bounded by ``MAX_SEARCH_LIMIT``.
+    - Records are ranked by ``tools.search.ranked_search``.
+    """
+    q = (q or "").strip()
+    if len(q) < SEARCH_MIN_LENGTH:
+        raise ApiError(f"The query must have at least {SEARCH_MIN_LENGTH} characters.")
+    limit = parse_positive_int(limit, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, "limit")
+    return model.browse(ranked_search(model, q, limit))
+
+
+def paginate(model, domain=None, limit=None, after=None, order=None):
+    """Return one page of records and the cursor of the next page.
+    - Records are sorted by ``id`` and the page starts right after the
+      record encoded in ``after``, so every page is a single indexed
+      ``id > x ORDER BY id LIMIT n`` query whatever its depth.
+    - ``order`` is the ``(field, descending)`` pair of ``parse_order`` to
+      sort the records by another field first; the cursor then also holds
+      the value of that field, and the page is still a single query.
+    - The next cursor is ``None`` on the last page.
+    """
+    limit = parse_limit(limit)
+    domain = list(domain or [])
+    order_key = "%s %s" % (order[0], "desc" if order[1] else "asc") if order else None
+    if after:
+        cursor = decode_cursor(after)
+        if cursor.get("order") != order_key:
+            raise ApiError("The cursor does not match the order.")
+        if order:
+            domain += _keyset_domain(model, order, cursor)
+        else:
+            domain.append(("id", ">", cursor["id"]))
+    search_order = f"{order_key}, id {order_key.split()[1]}" if order else "id"
+    records = model.search(domain, limit=limit + 1, order=search_order)
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        values = {"id": records[-1].id}
+        if order:
+            values.update(order=order_key, value=_keyset_value(records[-1], order[0]))
+        next_cursor = encode_cursor(values)
+    return records, next_cursor
+
+
+def sync_changes(model, change_domain, since=None, after=None, limit=None):
+    """Return a page of the changes of ``model`` since a sync token.
+    - ``change_domain(date)`` returns the domain of the records changed after
+      ``date``; without ``since`` every record is returned (full sync).
+    - Pages are walked by id with the ``after`` cursor, which also carries
+      the sync state, so that the token returned with the last page covers
+      the changes made while paging.
+    - Return the changed records, the ids of the removed records (archived
+      ones, plus deleted ones on the last page), the next cursor and, on the
+      last page, the sync token to use next time.
+    """
+    limit = parse_limit(limit)
+    if after:
+        state = decode_cursor(after)
+        last_id, start, since_date = state["id"], state.get("start"), state.get("t")
+        if not isinstance(start, str):
+            raise ApiError("Invalid cursor.")
+    else:
+        last_id, start, since_date = 0, str(model.env.cr.now()), None
+        if since:
+            since_date = decode_token(since).get("t")
+            if not isinstance(since_date, str):
+                raise ApiError("Invalid sync token.")
+    domain = [("id", ">", last_id)]
+    Tombstone = model.env["api.sync.tombstone"]
+    if since_date:
+        changed_after = Datetime.to_datetime(since_date) - SYNC_OVERLAP
+        if changed_after < Tombstone._get_retention_limit():
+            raise ApiError("Sync token expired, a full sync is required.", status=410)
+        domain += change_domain(changed_after)
+    records = model.with_context(active_test=False).search(
+        domain, limit=limit + 1, order="id"
+    )
+    next_cursor = sync_token = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(
+            {"id": records[-1].id, "start": start, "t": since_date}
+        )
+    removed_ids = []
+    if "active" in model._fields:
+        archived = records.filtered(lambda record: not record.active)
+        removed_ids, records = archived.ids, records - archived
+    if not next_cursor:
+        sync_token = encode_cursor({"t": start})
+        if since_date:
+            removed_ids += Tombstone._get_deleted_ids(model._name, changed_after)
+    return records, removed_ids, next_cursor, sync_token
+
+
+def stream_mode(stream=None):
+    """Return the streaming mode requested by the client.
+    - ``"ndjson"`` when the client accepts ``application/x-ndjson``.
+    - ``"json"`` when the ``stream`` query parameter is set.
+    - ``None`` for a regular paginated response.
+    """
+    if request.httprequest.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return "ndjson"
+    if stream and stream.lower() not in ("0", "false"):
+        return "json"
+    return None
+
+
+def stream_response(model, serializer, key, mode, domain=None, after=None):
+    """Stream every record of ``model`` matching ``domain`` after ``after``.
+    - Records are read by keyset batches of ``STREAM_BATCH_SIZE`` and each
+      batch is serialized and written out before the next one is read, so
+      memory stays flat whatever the size of the result.
+    - In ``"json"`` mode the body has the same shape as a paginated
+      response, in ``"ndjson"`` mode it holds one record per line.
+    - The body is produced after the controller returns and the request
+      cursor is closed, so the generator works in its own cursor, on the
+      read replica when the endpoint runs there (see ``read_replica``) and
+      it is still available.
+    """
+    last_id = decode_cursor(after)["id"] if after else 0
+    domain = list(domain or [])
+    registry = model.env.registry
+    model_name, uid, context = model._name, model.env.uid, dict(model.env.context)
+    use_replica = getattr(request, "api_replica", False)
+
+    def generate():
+        cursor_id = last_id
+        cr = replica.cursor(registry.db_name) if use_replica else None
+        if cr is None:
+            cr = registry.cursor()
+        with cr:
+            env = api.Environment(cr, uid, context)
+            if mode == "json":
+                yield b'{"%s":[' % key.encode("utf-8")
+            separator = b""
+            while True:
+                records = env[model_name].search(
+                    domain + [("id", ">", cursor_id)],
+                    limit=STREAM_BATCH_SIZE,
+                    order="id",
+                )
+                if not records:
+                    break
+                items = [encoding.dumps(item) for item in serializer(records)]
+                if mode == "json":
+                    yield separator + b",".join(items)
+                    separator = b","
+                else:
+                    yield b"".join(item + b"\n" for item in items)
+                cursor_id = records[-1].id
+                env.invalidate_all()
+            if mode == "json":
+                yield b'],"next":null}'
+
+    if mode == "ndjson":
+        content_type = NDJSON_MIMETYPE
+    else:
+        content_type = "application/json"
+    return Response(generate(), content_type=content_type, status=200)
+
+
+def cache_validators(aggregates):
+    """Return the strong ETag and the Last-Modified date of a response.
+    - ``aggregates`` is a list of ``(model, domain)`` whose records make the
+      response; each costs one ``read_group`` query for the number of
+      records and their last ``write_date``, record rules included.
+    - The ETag also covers the user, the query string and the ``Accept``
+      header, which select the representation.
+    """
+    httprequest = request.httprequest
+    state = [
+        aggregates[0][0].env.uid,
+        httprequest.query_string.decode("latin-1"),
+        httprequest.headers.get("Accept", ""),
+    ]
+    last_modified = None
+    for model, domain in aggregates:
+        groups = model.read_group(domain, ["write_date:max"], [])
+        count = groups[0]["__count"] if groups else 0
+        write_date = groups[0]["write_date"] if groups else False
+        state.append([model._name, count, str(write_date)])
+        if write_date and (not last_modified or write_date > last_modified):
+            last_modified = write_date
+    etag = hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+    return etag, last_modified
+
+
+def is_not_modified(etag, last_modified):
+    """Return whether the client copy matches the given validators.
+    - ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+    """
+    httprequest = request.httprequest
+    if httprequest.if_none_match:
+        # Compressed responses carry the ETag suffixed with their encoding.
+        return any(
+            httprequest.if_none_match.contains(tag)
+            for tag in [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+        )
+    if httprequest.if_modified_since and last_modified:
+        last_modified = last_modified.replace(
+            microsecond=0, tzinfo=datetime.timezone.utc
+        )
+        return last_modified <= httprequest.if_modified_since
+    return False
+
+
+def set_cache_validators(response, etag, last_modified):
+    """Add the ETag and Last-Modified headers to ``response``.
+    - Clients must revalidate before reusing their copy.
+    """
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Accept")
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    """Return an empty ``304 Not Modified`` response."""
+    return set_cache_validators(Response(status=304), etag, last_modified)
+
+
+def iter_ndjson(lines):
+    """Yield the JSON documents of an NDJSON stream, one per non-empty line.
+    - A line that is not valid JSON is yielded as an ``ApiError`` so that it
+      can be reported without aborting the other rows.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ApiError("Invalid JSON.")
+
+
+def iter_batches(iterable, size):
+    """Yield lists of at most ``size`` items of ``iterable``."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_request_rows():
+    """Yield the rows of a bulk request body.
+    - An ``application/x-ndjson`` body is read line by line as it arrives,
+      any other body must be a JSON array.
+    """
+    httprequest = request.httprequest
+    if httprequest.mimetype == NDJSON_MIMETYPE:
+        yield from iter_ndjson(httprequest.stream)
+        return
+    try:
+        rows = json.loads(httprequest.get_data())
+    except ValueError:
+        raise ApiError("Invalid JSON.") from None
+    if not isinstance(rows, list):
+        raise ApiError("The request body must be a JSON array.")
+    yield from rows
+
+
+def bulk_create(model, rows, prepare_vals, batch_size):
+    """Create records from ``rows`` in batches, with a result per row.
+    - ``prepare_vals`` turns a row into the values to create, or raises an
+      ``ApiError`` for an invalid row.
+    - Each batch is created by a single multi-record ``create`` in a
+      savepoint. If it fails, its rows are created one by one to isolate the
+      faulty ones, so one bad row does not abort the others.
+    - Return a list of ``{"index", "id"}`` or ``{"index", "error"}`` dicts,
+      in the order of ``rows``.
+    """
+    cr = model.env.cr
+    results = []
+    batch = []
+
+    def create_batch():
+        try:
+            with cr.savepoint():
+                records = model.create([vals for _index, vals in batch])
+            results.extend(
+                {"index": index, "id": record.id}
+                for (index, _vals), record in zip(batch, records)
+            )
+        except Exception:
+            for index, vals in batch:
+                try:
+                    with cr.savepoint():
+                        results.append({"index": index, "id": model.create(vals).id})
+                except Exception as e:
+                    results.append({"index": index, "error": str(e)})
+        batch.clear()
+
+    for index, row in enumerate(rows):
+        try:
+            if isinstance(row, ApiError):
+                raise row
+            batch.append((index, prepare_vals(row)))
+        except ApiError as e:
+            results.append({"index": index, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            create_batch()
+    if batch:
+        create_batch()
+    results.sort(key=lambda result: result["index"])
+    return results
@@ -0,0 +1,9 @@
+from . import api_export_job
+from . import api_sale_order_summary
+from . import api_sync_tombstone
+from . import auth_jwt_validator
+from . import ir_http
+from . import jwt_refresh_token
+from . import product
+from . import res_partner
+from . import sale_order
@@ -0,0 +1,255 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools import config
+
+from ..controllers.serializers import SERIALIZERS
+from ..tools import encoding
+
+_logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+# Longest time a cron run exports before it stops and schedules itself again.
+EXPORT_TIME_BUDGET = 240
+# Time kept below the real time limit of the cron workers, so that a run stops
+# and schedules itself again before it is killed.
+EXPORT_TIME_MARGIN = 30
+SALE_ORDER_CSV_COLUMNS = [
+    "id",
+    "name",
+    "date",
+    "partner_id",
+    "amount_total",
+    "state",
+    "line_id",
+    "product_id",
+    "product_name",
+    "quantity",
+    "price",
+]
+
+
+def export_time_budget():
+    """Return the time a cron run may spend exporting, in seconds.
+    - The cron workers are limited by ``limit_time_real_cron``, or by
+      ``limit_time_real`` when it is negative, as by default.
+    """
+    limit = config.get("limit_time_real_cron")
+    if limit is None or limit < 0:
+        limit = config.get("limit_time_real")
+    if not limit or limit <= 0:
+        return EXPORT_TIME_BUDGET
+    return min(EXPORT_TIME_BUDGET, max(limit - EXPORT_TIME_MARGIN, limit / 2))
+
+
+class ApiExportJob(models.Model):
+    """Export of a large collection, run in the background by a cron.
+    - Records are serialized by batches of ``EXPORT_BATCH_SIZE``, each batch
+      being appended to a gzip file of the data directory as a gzip member
+      of its own. The size of the file and the last exported id are committed
+      after each batch, so an interrupted export resumes from the last batch
+      instead of starting again.
+    - Files are deleted with their job, ``request_jwt.export_retention_hours``
+      hours (system parameter, 24 by default) after the job was created.
+    """
+
+    _name = "api.export.job"
+    _description = "API Export Job"
+    _order = "id"
+
+    user_id = fields.Many2one(
+        "res.users", required=True, ondelete="cascade", index=True, readonly=True
+    )
+    res_model = fields.Char(required=True, readonly=True)
+    serializer = fields.Char(required=True, readonly=True)
+    domain = fields.Text(default="[]", readonly=True)
+    file_format = fields.Selection(
+        [("ndjson", "NDJSON"), ("csv", "CSV")], required=True, readonly=True
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    access_token = fields.Char(
+        default=lambda self: secrets.token_hex(16), required=True, readonly=True
+    )
+    record_count = fields.Integer(readonly=True)
+    exported_count = fields.Integer(readonly=True)
+    last_id = fields.Integer(readonly=True)
+    file_size = fields.Integer(readonly=True)
+    error = fields.Text(readonly=True)
+
+    def _get_file_path(self):
+        """Return the path of the exported file of the job."""
+        self.ensure_one()
+        return os.path.join(
+            config["data_dir"],
+            "request_jwt",
+            "exports",
+            self.env.cr.dbname,
+            f"{self.access_token}.{self.file_format}.gz",
+        )
+
+    @api.model
+    def _enqueue(self, user, res_model, serializer, domain, file_format):
+        """Create an export job and wake up the export cron.
+        - Dates of ``domain`` are stored in the format of the ORM.
+        """
+        self = self.sudo()
+        job = self.create(
+            {
+                "user_id": user.id,
+                "res_model": res_model,
+                "serializer": serializer,
+                "domain": encoding.dumps(domain).decode("utf-8"),
+                "file_format": file_format,
+            }
+        )
+        self.env.ref("request_jwt.ir_cron_api_export_job")._trigger()
+        return job
+
+    def _get_status(self):
+        """Return the JSON representation of the job."""
+        self.ensure_one()
+        return {
+            "id": self.id,
+            "state": self.state,
+            "format": self.file_format,
+            "record_count": self.record_count,
+            "exported_count": self.exported_count,
+            "progress": self._get_progress(),
+            "size": self.file_size if self.state == "done" else None,
+            "error": self.error or None,
+        }
+
+    def _get_progress(self):
+        """Return the exported fraction of the records, between 0 and 1."""
+        if self.state == "done":
+            return 1.0
+        if not self.record_count:
+            return 0.0
+        return min(self.exported_count / self.record_count, 1.0)
+
+    def _encode_batch(self, items, header):
+        """Return the exported bytes of a batch of serialized records."""
+        if self.file_format == "ndjson":
+            return b"".join(encoding.dumps(item) + b"\n" for item in items)
+        output = io.StringIO()
+        writer = csv.DictWriter(output, SALE_ORDER_CSV_COLUMNS, extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        for item in items:
+            lines = item.get("lines") or [{}]
+            for line in lines:
+                row = dict(item, date=item.get("date") and str(item["date"]))
+                row.update(
+                    line_id=line.get("id"),
+                    product_id=line.get("product_id"),
+                    product_name=line.get("product_name"),
+                    quantity=line.get("quantity"),
+                    price=line.get("price"),
+                )
+                writer.writerow(row)
+        return output.getvalue().encode("utf-8")
+
+    def _run(self, deadline):
+        """Export the records of the job until it is done or ``deadline``.
+        - Return ``True`` when the job is finished.
+        """
+        self.ensure_one()
+        model = self.env[self.res_model].with_user(self.user_id)
+        domain = json.loads(self.domain)
+        if self.state == "pending":
+            self.write({"state": "running", "record_count": model.search_count(domain)})
+            self.env.cr.commit()
+        path = self._get_file_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as output:
+            # Drop what was written after the last committed batch.
+            output.seek(self.file_size)
+            output.truncate()
+            while time.monotonic() < deadline:
+                records = model.search(
+                    domain + [("id", ">", self.last_id)],
+                    limit=EXPORT_BATCH_SIZE,
+                    order="id",
+                )
+                if not records:
+                    self.write({"state": "done"})
+                    self.env.cr.commit()
+                    return True
+                items = SERIALIZERS[self.serializer](records)
+                data = self._encode_batch(items, header=not self.file_size)
+                output.write(gzip.compress(data))
+                output.flush()
+                os.fsync(output.fileno())
+                self.write(
+                    {
+                        "last_id": records[-1].id,
+                        "exported_count": self.exported_count + len(records),
+                        "file_size": output.tell(),
+                    }
+                )
+                self.env.cr.commit()
+                self.env.invalidate_all()
+        return False
+
+    @api.model
+    def _cron_run_jobs(self):
+        """Run the pending export jobs, oldest first.
+        - The cron schedules itself again when its time budget is spent, see
+          ``export_time_budget``.
+        """
+        deadline = time.monotonic() + export_time_budget()
+        jobs = self.search([("state", "in", ("pending", "running"))])
+        for job in jobs:
+            if time.monotonic() >= deadline:
+                self.env.ref("request_jwt.ir_cron_api_export_job")._trigger()
+                return
+            try:
+                finished = job._run(deadline)
+            except Exception as e:
+                self.env.cr.rollback()
+                _logger.exception("Export job %s failed.", job.id)
+                job.write({"state": "failed", "error": str(e)})
+                self.env.cr.commit()
+                continue
+            if not finished:
+                self.env.ref("request_jwt.ir_cron_api_export_job")._trigger()
+                return
+
+    def _get_retention_limit(self):
+        hours = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("request_jwt.export_retention_hours", "24")
+        )
+        return fields.Datetime.now() - timedelta(hours=hours)
+
+    def unlink(self):
+        paths = [job._get_file_path() for job in self]
+        res = super().unlink()
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return res
+
+    @api.autovacuum
+    def _gc_export_jobs(self):
+        self.search([("create_date", "<", self._get_retention_limit())]).unlink()
@@ -0,0 +1,158 @@
+from odoo import api, fields, models
+
+# Sale orders refreshed per statement by a full rebuild.
+REBUILD_BATCH_SIZE = 10000
+# Lines are in the order of sale.order.line; product names are stored in
+# every language, as the product_template column holds them.
+REFRESH_QUERY = """
+    INSERT INTO api_sale_order_summary (
+        order_id, name, date_order, partner_id, amount_total, state,
+        line_count, lines
+    )
+    SELECT
+        so.id, so.name, so.date_order, so.partner_id, so.amount_total,
+        so.state, COUNT(sol.id),
+        COALESCE(
+            jsonb_agg(
+                jsonb_build_object(
+                    'id', sol.id,
+                    'product_id', sol.product_id,
+                    'product_name', pt.name,
+                    'quantity', sol.product_uom_qty,
+                    'price', sol.price_unit
+                )
+                ORDER BY sol.sequence, sol.id
+            ) FILTER (WHERE sol.id IS NOT NULL),
+            '[]'
+        )
+    FROM sale_order so
+    LEFT JOIN sale_order_line sol ON sol.order_id = so.id
+    LEFT JOIN product_product pp ON pp.id = sol.product_id
+    LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+    WHERE {where}
+    GROUP BY so.id
+    ON CONFLICT (order_id) DO UPDATE SET
+        name = excluded.name,
+        date_order = excluded.date_order,
+        partner_id = excluded.partner_id,
+        amount_total = excluded.amount_total,
+        state = excluded.state,
+        line_count = excluded.line_count,
+        lines = excluded.lines
+"""
+
+
+class ApiSaleOrderSummary(models.Model):
+    """Precomputed representation of a sale order, read by its serializer.
+    - One record per sale order with its header, its number of lines and a
+      snapshot of its lines with the names of their products, so that a
+      page of orders is read from a single table.
+    - Summaries are refreshed just before the commit of the transactions
+      writing their order, its lines or the name of their products, with a
+      single set-based statement; until then, these orders are serialized
+      from the ORM.
+    - Missing summaries are built when the module is updated, and
+      ``_rebuild`` refreshes all of them by batches.
+    """
+
+    _name = "api.sale.order.summary"
+    _description = "API Sale Order Summary"
+    _log_access = False
+
+    order_id = fields.Many2one(
+        "sale.order", required=True, ondelete="cascade", readonly=True
+    )
+    name = fields.Char(readonly=True)
+    date_order = fields.Datetime(readonly=True)
+    partner_id = fields.Many2one("res.partner", readonly=True)
+    amount_total = fields.Float(readonly=True)
+    state = fields.Char(readonly=True)
+    line_count = fields.Integer(readonly=True)
+    lines = fields.Json(readonly=True)
+
+    _sql_constraints = [
+        ("order_id_unique", "unique(order_id)", "A sale order has one summary.")
+    ]
+
+    def init(self):
+        self._refresh(
+            "NOT EXISTS (SELECT 1 FROM api_sale_order_summary s"
+            " WHERE s.order_id = so.id)"
+        )
+
+    @api.model
+    def _refresh(self, where, params=None):
+        """Refresh the summaries of the sale orders matching ``where``.
+        - ``where`` is a trusted SQL condition on the ``so`` sale order alias.
+        """
+        self.env.cr.execute(REFRESH_QUERY.format(where=where), params or {})
+
+    @api.model
+    def _rebuild(self):
+        """Refresh the summaries of all the sale orders."""
+        self.env.flush_all()
+        self.env.cr.execute("SELECT COALESCE(MAX(id), 0) FROM sale_order")
+        max_id = self.env.cr.fetchone()[0]
+        for first in range(0, max_id, REBUILD_BATCH_SIZE):
+            self._refresh(
+                "so.id > %(first)s AND so.id <= %(last)s",
+                {"first": first, "last": first + REBUILD_BATCH_SIZE},
+            )
+        self.env.invalidate_all()
+
+    @api.model
+    def _mark_stale(self, order_ids=(), product_ids=()):
+        """Refresh the summaries of orders once the transaction is flushed.
+        - ``product_ids`` refreshes the orders with lines of these products.
+        """
+        precommit = self.env.cr.precommit
+        stale = precommit.data.get("request_jwt.summaries")
+        if stale is None:
+            stale = precommit.data["request_jwt.summaries"] = {
+                "orders": set(),
+                "products": set(),
+            }
+            precommit.add(lambda: self._refresh_stale(stale))
+        stale["orders"].update(order_ids)
+        stale["products"].update(product_ids)
+
+    @api.model
+    def _refresh_stale(self, stale):
+        # Stored totals are recomputed when the transaction is flushed.
+        self.env.flush_all()
+        if stale["orders"]:
+            self._refresh("so.id IN %(ids)s", {"ids": tuple(stale["orders"])})
+        if stale["products"]:
+            self._refresh(
+                "so.id IN (SELECT order_id FROM sale_order_line"
+                " WHERE product_id IN %(ids)s)",
+                {"ids": tuple(stale["products"])},
+            )
+
+    @api.model
+    def _read_summaries(self, orders, fields):
+        """Return the ``fields`` of the up to date summaries of ``orders``.
+        - Return a dict of the rows by order id, in the order of ``orders``.
+        - Orders written by the current transaction, or with lines of products
+          renamed by it, are left out.
+        """
+        stale = self.env.cr.precommit.data.get("request_jwt.summaries")
+        ids = set(orders.ids)
+        if stale:
+            ids -= stale["orders"]
+        if stale and stale["products"] and ids:
+            self.env.cr.execute(
+                "SELECT DISTINCT order_id FROM sale_order_line"
+                " WHERE order_id IN %s AND product_id IN %s",
+                [tuple(ids), tuple(stale["products"])],
+            )
+            ids -= {row[0] for row in self.env.cr.fetchall()}
+        if not ids:
+            return {}
+        rows = {
+            row["order_id"]: row
+            for row in self.sudo().search_read(
+                [("order_id", "in", list(ids))], fields, load=None
+            )
+        }
+        return {order_id: rows[order_id] for order_id in orders.ids if order_id in rows}
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from odoo import api, fields, models, tools
+
+
+class ApiSyncTombstone(models.Model):
+    """Deletion log read by the delta sync endpoints.
+    - One record per deleted record of a synchronized model, so that clients
+      can drop it from their local copy.
+    - Tombstones of records with a company are only returned to the users
+      of that company.
+    - Tombstones are kept ``request_jwt.tombstone_retention_days`` days (system
+      parameter, 90 by default); clients that did not sync for longer must
+      start a full sync again.
+    """
+
+    _name = "api.sync.tombstone"
+    _description = "API Sync Tombstone"
+    _order = "id"
+
+    res_model = fields.Char(required=True, index=True, readonly=True)
+    res_id = fields.Integer(required=True, readonly=True)
+    company_id = fields.Many2one("res.company", readonly=True)
+
+    def init(self):
+        tools.create_index(
+            self._cr,
+            "api_sync_tombstone_res_model_create_date_index",
+            self._table,
+            ["res_model", "create_date"],
+        )
+
+    @api.model
+    def _record(self, records):
+        """Log the deletion of ``records``."""
+        has_company = "company_id" in records._fields
+        self.sudo().create(
+            [
+                {
+                    "res_model": records._name,
+                    "res_id": record.id,
+                    "company_id": has_company and record.company_id.id,
+                }
+                for record in records
+            ]
+        )
+
+    @api.model
+    def _get_retention_limit(self):
+        days = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("request_jwt.tombstone_retention_days", "90")
+        )
+        return fields.Datetime.now() - timedelta(days=days)
+
+    @api.model
+    def _get_deleted_ids(self, model_name, since):
+        """Return the ids of the records of ``model_name`` deleted after ``since``.
+        - Only the records without company or of the companies of the current
+          user are returned.
+        """
+        tombstones = self.sudo().search_read(
+            [
+                ("res_model", "=", model_name),
+                ("create_date", ">", since),
+                ("company_id", "in", self.env.companies.ids + [False]),
+            ],
+            ["res_id"],
+        )
+        return [tombstone["res_id"] for tombstone in tombstones]
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        self.search([("create_date", "<", self._get_retention_limit())]).unlink()
@@ -0,0 +1,63 @@
+import time
+
+import jwt
+
+from odoo import api, models, tools
+
+from ..tools.token_cache import token_cache
+
+
+class AuthJwtValidator(models.Model):
+    _inherit = "auth.jwt.validator"
+
+    def _flush_token_cache(self):
+        """Forget the tokens verified with the previous configuration.
+        - Clearing the registry caches signals the change to the other workers.
+        """
+        token_cache.clear()
+        self.env.registry.clear_caches()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._flush_token_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._flush_token_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._flush_token_cache()
+        return res
+
+    @api.model
+    @tools.ormcache("validator_name")
+    def _get_token_issuing_params(self, validator_name):
+        """Return the audience, issuer, secret and lifetime of issued tokens.
+        - Resolved once per registry: writing a validator or a system
+          parameter clears the cache in every worker.
+        """
+        validator = self.sudo()._get_validator_by_name(validator_name)
+        secret = validator.secret_key
+        params = self.env["ir.config_parameter"].sudo()
+        if validator.secret_config_parameter_check:
+            secret = params.get_param("jwt_secret")
+        expiration = int(params.get_param("jwt_expiration", "3600"))
+        return validator.audience, validator.issuer, secret, expiration
+
+    @api.model
+    def _issue_token(self, validator_name, payload):
+        """Return a signed JWT for ``payload``, valid for ``validator_name``.
+        - Same token as ``_encode`` but without any query once the issuing
+          parameters are cached.
+        """
+        audience, issuer, secret, expiration = self._get_token_issuing_params(
+            validator_name
+        )
+        payload = dict(
+            payload, exp=int(time.time()) + expiration, aud=audience, iss=issuer
+        )
+        return jwt.encode(payload, key=secret, algorithm="HS256")
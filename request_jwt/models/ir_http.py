@@ -0,0 +1,155 @@
+import hashlib
+import time
+
+from odoo import models
+from odoo.http import request
+
+from ..controllers.utils import json_response
+from ..tools import metrics
+from ..tools.admission import admission
+from ..tools.compression import compress_response
+from ..tools.metrics import api_metrics
+from ..tools.token_cache import token_cache
+
+# Longest time a verified token is trusted without checking it again, so that
+# changes of the resolved user or partner are picked up even for long-lived
+# tokens.
+TOKEN_CACHE_MAX_TTL = 600
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = "ir.http"
+
+    @classmethod
+    def _authenticate(cls, endpoint):
+        if not request.httprequest.path.startswith("/api/"):
+            return super()._authenticate(endpoint)
+        metrics.start_request()
+        with metrics.timed("auth"):
+            return super()._authenticate(endpoint)
+
+    @classmethod
+    def _pre_dispatch(cls, rule, args):
+        super()._pre_dispatch(rule, args)
+        request.api_route = rule.rule
+
+    @classmethod
+    def _get_api_subject(cls):
+        """Return the JWT subject of an API request, or ``None``."""
+        if not request.httprequest.path.startswith("/api/"):
+            return None
+        payload = getattr(request, "jwt_payload", None)
+        if not payload:
+            return None
+        return str(payload.get("user_id") or payload.get("email") or request.env.uid)
+
+    @classmethod
+    def _dispatch(cls, endpoint):
+        """Admit the API requests within the limits of their JWT subject.
+        - Refused requests get a ``429`` with a ``Retry-After`` header before
+          the endpoint runs.
+        - The sub-requests of a batch are dispatched here too, and charged to
+          the limits of their own route; the batch already counts in the
+          concurrency of the subject over all the routes.
+        - The concurrency slot is released when the endpoint returns, before
+          the body of a streamed response is sent.
+        """
+        subject = cls._get_api_subject()
+        if subject is None:
+            return super()._dispatch(endpoint)
+        route = getattr(request, "api_route", None) or request.httprequest.path
+        nested = getattr(request, "api_admitted", False)
+        request.api_admitted = True
+        slot, retry_after = admission.acquire(request.db, subject, route, nested=nested)
+        if retry_after:
+            response = json_response({"error": "Too many requests."}, status=429)
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+        try:
+            return super()._dispatch(endpoint)
+        finally:
+            admission.release(slot)
+
+    @classmethod
+    def _post_dispatch(cls, response):
+        super()._post_dispatch(response)
+        if not request.httprequest.path.startswith("/api/"):
+            return
+        with metrics.timed("compress"):
+            compress_response(response, request.httprequest.accept_encodings)
+        cls._observe_api_request(response)
+
+    @classmethod
+    def _handle_error(cls, exception):
+        """Count the API requests failing before their response is built.
+        - Authentication errors and exceptions of the endpoints are observed
+          with the status of their error response.
+        """
+        response = super()._handle_error(exception)
+        if request.httprequest.path.startswith("/api/"):
+            cls._observe_api_request(response)
+        return response
+
+    @classmethod
+    def _observe_api_request(cls, response):
+        """Add the timings of the API request to its response and metrics."""
+        timings = metrics.finish_request()
+        if timings:
+            response.headers["Server-Timing"] = metrics.server_timing(timings)
+            api_metrics.observe(
+                getattr(request, "api_route", None) or request.httprequest.path,
+                response.status_code,
+                timings,
+            )
+
+    @classmethod
+    def _get_cacheable_token(cls):
+        """Return the bearer token of the request, or ``None``."""
+        auth_header = request.httprequest.environ.get("HTTP_AUTHORIZATION", "")
+        scheme, _sep, token = auth_header.partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            return None
+        return token.strip()
+
+    @classmethod
+    def _auth_method_jwt(cls, validator_name=None):
+        """Authenticate with a JWT, skipping the validation of known tokens.
+        - A token verified once is cached with the resolved user and partner
+          until it expires, so the following requests cost no query.
+        """
+        token = cls._get_cacheable_token()
+        if not token or request.session.uid:
+            return super()._auth_method_jwt(validator_name=validator_name)
+        key = (
+            request.db,
+            validator_name,
+            hashlib.sha256(token.encode("utf-8")).hexdigest(),
+        )
+        sequence = request.registry.cache_sequence
+        cached = token_cache.get(key, sequence)
+        if cached:
+            uid, partner_id, payload = cached
+            request.update_env(user=uid)
+            request.jwt_payload = dict(payload)
+            request.jwt_partner_id = partner_id
+            return None
+        res = super()._auth_method_jwt(validator_name=validator_name)
+        validator = (
+            request.env["auth.jwt.validator"]
+            .sudo()
+            ._get_validator_by_name(validator_name)
+        )
+        if getattr(validator, "cookie_enabled", False):
+            # The cookie must be set on every response.
+            return res
+        payload = request.jwt_payload
+        expiry = time.time() + TOKEN_CACHE_MAX_TTL
+        if payload.get("exp"):
+            expiry = min(expiry, float(payload["exp"]))
+        token_cache.set(
+            key,
+            sequence,
+            expiry,
+            (request.env.uid, request.jwt_partner_id, dict(payload)),
+        )
+        return res
@@ -0,0 +1,95 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import AccessDenied
+
+
+class JwtRefreshToken(models.Model):
+    """Long-lived token exchanged for new access tokens without a password.
+    - Only a hash of the token is stored.
+    - Tokens are rotated: each refresh revokes the token it consumes and
+      issues a new one of the same family. Reusing a revoked token revokes
+      the whole family, as it means the token was stolen.
+    """
+
+    _name = "jwt.refresh.token"
+    _description = "JWT Refresh Token"
+    _order = "id desc"
+
+    user_id = fields.Many2one(
+        "res.users", required=True, ondelete="cascade", index=True, readonly=True
+    )
+    token_hash = fields.Char(required=True, readonly=True)
+    family = fields.Char(required=True, index=True, readonly=True)
+    expiration_date = fields.Datetime(required=True, readonly=True)
+    revoked = fields.Boolean(readonly=True)
+
+    _sql_constraints = [
+        ("token_hash_unique", "unique(token_hash)", "Refresh tokens must be unique.")
+    ]
+
+    @api.model
+    def _hash_token(self, token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @api.model
+    def _issue(self, user, family=None):
+        """Create a refresh token for ``user`` and return it in clear."""
+        token = secrets.token_urlsafe(32)
+        expiration = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("jwt_refresh_expiration", "2592000")
+        )
+        self.create(
+            {
+                "user_id": user.id,
+                "token_hash": self._hash_token(token),
+                "family": family or secrets.token_hex(16),
+                "expiration_date": fields.Datetime.now()
+                + timedelta(seconds=expiration),
+            }
+        )
+        return token
+
+    @api.model
+    def _find(self, token):
+        """Return the locked record of ``token``, or raise ``AccessDenied``."""
+        record = self.search([("token_hash", "=", self._hash_token(token))], limit=1)
+        if not record:
+            raise AccessDenied()
+        # Serialize concurrent refreshes of the same token.
+        self.env.cr.execute(
+            "SELECT id FROM jwt_refresh_token WHERE id = %s FOR UPDATE", (record.id,)
+        )
+        record.invalidate_recordset(["revoked"])
+        return record
+
+    @api.model
+    def _rotate(self, token):
+        """Consume ``token`` and return its user and a new refresh token.
+        - Raise ``AccessDenied`` if the token is unknown, expired, revoked
+          or belongs to an inactive user.
+        """
+        record = self._find(token)
+        if record.revoked:
+            record._revoke_family()
+            raise AccessDenied()
+        if record.expiration_date <= fields.Datetime.now() or not record.user_id.active:
+            raise AccessDenied()
+        record.revoked = True
+        return record.user_id, self._issue(record.user_id, family=record.family)
+
+    @api.model
+    def _revoke(self, token):
+        """Revoke ``token`` and every token issued from it."""
+        self._find(token)._revoke_family()
+
+    def _revoke_family(self):
+        self.search([("family", "in", self.mapped("family"))]).write({"revoked": True})
+
+    @api.autovacuum
+    def _gc_expired(self):
+        self.search([("expiration_date", "<", fields.Datetime.now())]).unlink()
@@ -0,0 +1,109 @@
+from odoo import api, models, tools
+
+from ..tools.catalog import invalidate_catalog
+from ..tools.changes import notify_changes
+from ..tools.search import (
+    JSON_PREFIX_PATTERN,
+    PREFIX_PATTERN,
+    create_trigram_indexes,
+)
+
+# Translated names are stored as JSON objects, searched in every language.
+NAME_SEARCH_EXPRESSION = "jsonb_path_query_array(%s, '$.*')::text"
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    def init(self):
+        # Index of the categ_id filter of /api/product.
+        tools.create_index(
+            self._cr, "product_template_categ_id_index", self._table, ["categ_id"]
+        )
+        # Index of /api/product/search, on the names in every language.
+        create_trigram_indexes(
+            self._cr,
+            self._table,
+            {"product_template_name_trgm_index": NAME_SEARCH_EXPRESSION % "name"},
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        invalidate_catalog(self.env)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        invalidate_catalog(self.env)
+        variants = self.with_context(active_test=False).product_variant_ids
+        notify_changes(variants)
+        if "name" in vals:
+            # Product names are part of the sale order summaries.
+            self.env["api.sale.order.summary"]._mark_stale(product_ids=variants.ids)
+        return super().write(vals)
+
+    def update_field_translations(self, field_name, translations):
+        # Translations are written without write().
+        invalidate_catalog(self.env)
+        if field_name == "name":
+            variants = self.with_context(active_test=False).product_variant_ids
+            self.env["api.sale.order.summary"]._mark_stale(product_ids=variants.ids)
+        return super().update_field_translations(field_name, translations)
+
+    def unlink(self):
+        invalidate_catalog(self.env)
+        # Variants are deleted by the database cascade, without their unlink.
+        variants = self.with_context(active_test=False).product_variant_ids
+        self.env["api.sync.tombstone"]._record(variants)
+        notify_changes(variants)
+        return super().unlink()
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    def init(self):
+        # Index of /api/product/search.
+        create_trigram_indexes(
+            self._cr,
+            self._table,
+            {"product_product_default_code_trgm_index": "default_code"},
+        )
+
+    @api.model
+    def _api_search_columns(self, query):
+        """Return the SQL expressions matched by /api/product/search.
+        - Each comes with the LIKE pattern of its prefix matches; names are
+          JSON arrays of their translations.
+        """
+        template = query.left_join(
+            self._table, "product_tmpl_id", "product_template", "id", "product_tmpl_id"
+        )
+        return [
+            (NAME_SEARCH_EXPRESSION % f'"{template}"."name"', JSON_PREFIX_PATTERN),
+            (f'"{self._table}"."default_code"', PREFIX_PATTERN),
+        ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        invalidate_catalog(self.env)
+        products = super().create(vals_list)
+        notify_changes(products)
+        return products
+
+    def write(self, vals):
+        invalidate_catalog(self.env)
+        notify_changes(self)
+        return super().write(vals)
+
+    def update_field_translations(self, field_name, translations):
+        # Translations are written without write().
+        invalidate_catalog(self.env)
+        if field_name == "name":
+            self.env["api.sale.order.summary"]._mark_stale(product_ids=self.ids)
+        return super().update_field_translations(field_name, translations)
+
+    def unlink(self):
+        invalidate_catalog(self.env)
+        self.env["api.sync.tombstone"]._record(self)
+        notify_changes(self)
+        return super().unlink()
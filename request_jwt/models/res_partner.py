@@ -0,0 +1,59 @@
+from odoo import api, models, tools
+
+from ..tools.changes import notify_changes
+from ..tools.search import PREFIX_PATTERN, create_trigram_indexes
+
+
+class ResPartner(models.Model):
+    _inherit = "res.partner"
+
+    def init(self):
+        # Indexes of the filters of /api/res_partner, pages being sorted by id.
+        tools.create_index(
+            self._cr,
+            "res_partner_country_id_is_company_index",
+            self._table,
+            ["country_id", "is_company", "id"],
+        )
+        tools.create_index(
+            self._cr,
+            "res_partner_is_company_id_index",
+            self._table,
+            ["is_company", "id"],
+        )
+        tools.create_index(self._cr, "res_partner_email_index", self._table, ["email"])
+        # Indexes of /api/res_partner/search.
+        create_trigram_indexes(
+            self._cr,
+            self._table,
+            {
+                "res_partner_name_trgm_index": "name",
+                "res_partner_email_trgm_index": "email",
+                "res_partner_vat_trgm_index": "vat",
+            },
+        )
+
+    @api.model
+    def _api_search_columns(self, query):
+        """Return the SQL expressions matched by /api/res_partner/search.
+        - Each comes with the LIKE pattern of its prefix matches.
+        """
+        return [
+            (f'"{self._table}"."{fname}"', PREFIX_PATTERN)
+            for fname in ("name", "email", "vat")
+        ]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super().create(vals_list)
+        notify_changes(partners)
+        return partners
+
+    def write(self, vals):
+        notify_changes(self)
+        return super().write(vals)
+
+    def unlink(self):
+        self.env["api.sync.tombstone"]._record(self)
+        notify_changes(self)
+        return super().unlink()
@@ -0,0 +1,71 @@
+from odoo import api, models, tools
+
+from ..tools.changes import notify_changes
+
+
+class SaleOrder(models.Model):
+    _inherit = "sale.order"
+
+    def init(self):
+        # Composite indexes of the filters of /api/sale_order, sorted by date
+        # then id so that a filtered page is read without sorting.
+        for column in ("partner_id", "state"):
+            tools.create_index(
+                self._cr,
+                f"sale_order_{column}_date_order_index",
+                self._table,
+                [column, "date_order", "id"],
+            )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        orders = super().create(vals_list)
+        notify_changes(orders)
+        self.env["api.sale.order.summary"]._mark_stale(orders.ids)
+        return orders
+
+    def write(self, vals):
+        notify_changes(self)
+        self.env["api.sale.order.summary"]._mark_stale(self.ids)
+        return super().write(vals)
+
+    def unlink(self):
+        self.env["api.sync.tombstone"]._record(self)
+        notify_changes(self)
+        return super().unlink()
+
+
+class SaleOrderLine(models.Model):
+    _inherit = "sale.order.line"
+
+    # Lines are returned with their order, whose totals they change.
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self._notify_orders()
+        return lines
+
+    def write(self, vals):
+        self._notify_orders()
+        res = super().write(vals)
+        if "order_id" in vals:
+            self._notify_orders()
+        return res
+
+    def unlink(self):
+        self._notify_orders()
+        orders = self.order_id
+        res = super().unlink()
+        # Delta syncs find the orders of deleted lines by their write date.
+        orders = orders.exists()
+        if orders:
+            self.env.cr.execute(
+                "UPDATE sale_order SET write_date = %s WHERE id IN %s",
+                [self.env.cr.now(), tuple(orders.ids)],
+            )
+            orders.invalidate_recordset(["write_date"])
+        return res
+
+    def _notify_orders(self):
+        notify_changes(self.order_id)
+        self.env["api.sale.order.summary"]._mark_stale(self.order_id.ids)
@@ -1 +1,2 @@
 from . import test_auth_jwt_demo
+from . import test_api
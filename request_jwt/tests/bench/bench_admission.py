@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Measure the latency of well-behaved clients while another one is abusive.
+
+Usage::
+
+    python3 bench_admission.py --url http://localhost:8069 \\
+        --login alice --password alice --abuser-login bob --abuser-password bob \\
+        --duration 30 --concurrency 4 --abuser-concurrency 32 --max-slowdown 1.5
+
+Run the server with admission control enabled, e.g. with
+``request_jwt_rate_limit = 20`` and ``request_jwt_max_concurrency = 4``, and
+two users so that the clients are different JWT subjects. The well-behaved
+clients get ``--path`` in a loop with ``--concurrency`` threads, first alone
+then while ``--abuser-concurrency`` threads of the abusive client loop on the
+same path. The p50/p95/p99 latencies of both phases are reported with the
+share of the abusive requests refused with a ``429``; ``--max-slowdown``
+fails the run when the p99 latency of the well-behaved clients grows more
+than that factor under abuse.
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_api import percentile
+
+
+def login(args, login, password):
+    resp = requests.post(
+        f"{args.url}/api/auth_jwt", json={"login": login, "password": password}
+    )
+    resp.raise_for_status()
+    return resp.json()["token"]
+
+
+def loop(args, token, stop, results):
+    """Get ``args.path`` until ``stop`` is set, appending (latency, status)."""
+    session = requests.Session()
+    headers = {"Authorization": "Bearer " + token}
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            resp = session.get(args.url + args.path, headers=headers, timeout=60)
+            resp.content  # noqa: B018
+        except requests.RequestException:
+            results.append((time.perf_counter() - start, None))
+            continue
+        results.append((time.perf_counter() - start, resp.status_code))
+
+
+def run(args, clients):
+    """Run the ``(token, concurrency)`` clients for ``args.duration`` seconds.
+    - Return the ``(latency, status)`` results of each client.
+    """
+    stop = threading.Event()
+    results = [[] for _client in clients]
+    threads = sum(concurrency for _token, concurrency in clients)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for (token, concurrency), client_results in zip(clients, results):
+            for _i in range(concurrency):
+                executor.submit(loop, args, token, stop, client_results)
+        time.sleep(args.duration)
+        stop.set()
+    return results
+
+
+def stats(results):
+    latencies = sorted(
+        latency for latency, status in results if status and status != 429
+    )
+    refused = sum(1 for _latency, status in results if status == 429)
+    errors = sum(1 for _latency, status in results if not status or status >= 500)
+    return {
+        "requests": len(results),
+        "refused": refused,
+        "errors": errors,
+        "p50_ms": (percentile(latencies, 50) or 0) * 1000,
+        "p95_ms": (percentile(latencies, 95) or 0) * 1000,
+        "p99_ms": (percentile(latencies, 99) or 0) * 1000,
+    }
+
+
+def report(name, data):
+    print(
+        f"{name:>22} {data['requests']:>8} {data['refused']:>8} "
+        f"{data['errors']:>6} {data['p50_ms']:>8.1f} {data['p95_ms']:>8.1f} "
+        f"{data['p99_ms']:>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--login", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--abuser-login", required=True)
+    parser.add_argument("--abuser-password", required=True)
+    parser.add_argument("--path", default="/api/sale_order?limit=100")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--abuser-concurrency", type=int, default=32)
+    parser.add_argument("--max-slowdown", type=float)
+    args = parser.parse_args()
+
+    token = login(args, args.login, args.password)
+    abuser_token = login(args, args.abuser_login, args.abuser_password)
+    print(
+        f"{'phase':>22} {'requests':>8} {'429':>8} {'errors':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    (alone,) = run(args, [(token, args.concurrency)])
+    alone = stats(alone)
+    report("well-behaved alone", alone)
+    behaved, abuser = run(
+        args, [(token, args.concurrency), (abuser_token, args.abuser_concurrency)]
+    )
+    behaved, abuser = stats(behaved), stats(abuser)
+    report("well-behaved, abused", behaved)
+    report("abuser", abuser)
+    slowdown = behaved["p99_ms"] / alone["p99_ms"] if alone["p99_ms"] else 0
+    print(
+        f"p99 slowdown: x{slowdown:.2f}, abusive requests refused: "
+        f"{abuser['refused'] / max(abuser['requests'], 1) * 100:.1f}%"
+    )
+    if args.max_slowdown and slowdown > args.max_slowdown:
+        sys.exit(f"p99 slowdown above x{args.max_slowdown:g}")
+
+
+if __name__ == "__main__":
+    main()
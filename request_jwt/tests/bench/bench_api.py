@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""Load test every endpoint of the API and save the results as JSON.
+
+Usage::
+
+    python3 bench_api.py --url http://localhost:8069 --login admin \\
+        --password admin --requests 500 --concurrency 16 \\
+        --server-pid $(pgrep -of odoo-bin) --output results.json \\
+        --compare baseline.json
+
+Seed the database with ``seed_data.py`` first. Each scenario sends
+``--requests`` requests with ``--concurrency`` threads; the parameters of
+every request are drawn from a random generator seeded with its index, so
+runs are reproducible. For each scenario the report holds the throughput,
+the p50/p95/p99 latencies, the mean number of SQL queries read from the
+``Server-Timing`` header, and the errors.
+
+``--server-pid`` is the pid of the Odoo server; the peak RSS of that process
+and of its workers is reported. ``--compare`` prints the relative change of
+the throughput and of the p95 latency against a previous result file, and
+``--max-p99`` fails the run when a scenario is slower than a latency budget.
+"""
+
+import argparse
+import json
+import os
+import platform
+import queue
+import random
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+QUERIES_RE = re.compile(r'sql;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(values, rank):
+    """Return the ``rank`` percentile of the sorted ``values``."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * rank / 100))]
+
+
+def peak_rss(pid):
+    """Return the peak RSS in KiB of ``pid`` and of its children processes."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    total += int(line.split()[1])
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            for child in children.read().split():
+                total += peak_rss(int(child))
+    except OSError:
+        pass
+    return total
+
+
+class Client:
+    """Thread safe client holding the access token and the benchmark data."""
+
+    def __init__(self, args):
+        self.args = args
+        self.url = args.url
+        self._local = threading.local()
+        data = self.login()
+        self.token = data["token"]
+        self.refresh_tokens = queue.Queue()
+        self.refresh_tokens.put(data["refresh_token"])
+        for _i in range(args.concurrency - 1):
+            self.refresh_tokens.put(self.login()["refresh_token"])
+        self.partner_ids = self.ids("/api/res_partner", "res_partner")
+        self.product_ids = self.ids("/api/product", "products")
+        self.order_ids = self.ids("/api/sale_order", "sale_order")
+        self.sync_tokens = {
+            key: self.last_sync_token(path, key)
+            for path, key in (
+                ("/api/res_partner/changes", "res_partner"),
+                ("/api/product/changes", "products"),
+                ("/api/sale_order/changes", "sale_order"),
+            )
+        }
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def login(self):
+        resp = self.session.post(
+            f"{self.url}/api/auth_jwt",
+            json={"login": self.args.login, "password": self.args.password},
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def request(self, method, path, token=True, **kwargs):
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = "Bearer " + self.token
+        return self.session.request(
+            method, self.url + path, headers=headers, timeout=60, **kwargs
+        )
+
+    def ids(self, path, key):
+        """Return the ids of the last records of a list endpoint."""
+        resp = self.request("GET", f"{path}?fields=id&order=-id&limit=1000")
+        resp.raise_for_status()
+        return [record["id"] for record in resp.json()[key]]
+
+    def last_sync_token(self, path, key):
+        """Return a sync token for the changes of the last records."""
+        resp = self.request("GET", f"{path}?fields=id&limit=1000")
+        resp.raise_for_status()
+        data = resp.json()
+        while data["next"]:
+            resp = self.request(
+                "GET", f"{path}?fields=id&limit=1000&after={data['next']}"
+            )
+            resp.raise_for_status()
+            data = resp.json()
+        return data["sync_token"]
+
+
+def order_payload(client, rng):
+    return {
+        "name": "Bench API order",
+        "partner_id": rng.choice(client.partner_ids),
+        "lines": [
+            {
+                "product_id": rng.choice(client.product_ids),
+                "quantity": rng.randint(1, 10),
+                "price": round(rng.uniform(1, 100), 2),
+            }
+            for _line in range(rng.randint(5, 20))
+        ],
+    }
+
+
+def refresh(client, rng):
+    refresh_token = client.refresh_tokens.get()
+    try:
+        resp = client.request(
+            "POST",
+            "/api/auth_jwt/refresh",
+            token=False,
+            json={"refresh_token": refresh_token},
+        )
+        if resp.ok:
+            refresh_token = resp.json()["refresh_token"]
+        return resp
+    finally:
+        client.refresh_tokens.put(refresh_token)
+
+
+def ingest(client, rng):
+    lines = [json.dumps(order_payload(client, rng)) for _i in range(20)]
+    return client.request(
+        "POST",
+        "/api/sale_order/ingest?batch_size=10",
+        data="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+
+def batch(client, rng):
+    items = [{"path": "/api/auth_jwt/whoami"}]
+    items.append({"path": f"/api/res_partner/{rng.choice(client.partner_ids)}"})
+    items += [
+        {"path": f"/api/product/{rng.choice(client.product_ids)}"} for _i in range(3)
+    ]
+    items.append({"path": f"/api/sale_order/{rng.choice(client.order_ids)}"})
+    return client.request("POST", "/api/batch", json=items)
+
+
+def search_text(rng):
+    """Return a search query on the seeded names, emails or references.
+    - One query in four has two swapped letters, matched by similarity only.
+    """
+    text = rng.choice(
+        [
+            f"Bench partner {rng.randint(0, 99999):07d}"[: rng.randint(16, 21)],
+            f"bench.partner.{rng.randint(0, 99999)}",
+            f"BENCH-{rng.randint(0, 9999):07d}"[: rng.randint(9, 13)],
+            f"product {rng.randint(0, 9999):07d}",
+        ]
+    )
+    if rng.random() < 0.25:
+        index = rng.randint(0, len(text) - 2)
+        text = text[:index] + text[index + 1] + text[index] + text[index + 2 :]
+    return text
+
+
+def get(path):
+    """Return a scenario getting ``path``, formatted with the client and rng."""
+
+    def scenario(client, rng):
+        return client.request("GET", path(client, rng))
+
+    return scenario
+
+
+SCENARIOS = {
+    "login": lambda client, rng: client.request(
+        "POST",
+        "/api/auth_jwt",
+        token=False,
+        json={"login": client.args.login, "password": client.args.password},
+    ),
+    "refresh": refresh,
+    "whoami": get(lambda client, rng: "/api/auth_jwt/whoami"),
+    "partner_list": get(lambda client, rng: "/api/res_partner?limit=100"),
+    "partner_filtered": get(
+        lambda client, rng: "/api/res_partner?is_company=1&order=name&limit=100"
+    ),
+    "partner_get": get(
+        lambda client, rng: f"/api/res_partner/{rng.choice(client.partner_ids)}"
+    ),
+    "partner_search": lambda client, rng: client.request(
+        "GET", "/api/res_partner/search", params={"q": search_text(rng)}
+    ),
+    "partner_changes": get(
+        lambda client, rng: "/api/res_partner/changes?since="
+        + client.sync_tokens["res_partner"]
+    ),
+    "partner_create": lambda client, rng: client.request(
+        "POST",
+        "/api/res_partner",
+        json={"name": "Bench API partner", "email": f"bench.{rng.random()}@x.com"},
+    ),
+    "partner_bulk": lambda client, rng: client.request(
+        "POST",
+        "/api/res_partner/bulk",
+        json=[
+            {"name": "Bench API partner", "email": f"bench.{rng.random()}@x.com"}
+            for _i in range(50)
+        ],
+    ),
+    "product_list": get(lambda client, rng: "/api/product?limit=100"),
+    "product_get": get(
+        lambda client, rng: f"/api/product/{rng.choice(client.product_ids)}"
+    ),
+    "product_search": lambda client, rng: client.request(
+        "GET", "/api/product/search", params={"q": search_text(rng)}
+    ),
+    "product_changes": get(
+        lambda client, rng: "/api/product/changes?since="
+        + client.sync_tokens["products"]
+    ),
+    "sale_order_list": get(lambda client, rng: "/api/sale_order?limit=100"),
+    "sale_order_filtered": get(
+        lambda client, rng: "/api/sale_order?order=-date&limit=100&partner_id="
+        f"{rng.choice(client.partner_ids)}"
+    ),
+    "sale_order_get": get(
+        lambda client, rng: f"/api/sale_order/{rng.choice(client.order_ids)}"
+    ),
+    "sale_order_changes": get(
+        lambda client, rng: "/api/sale_order/changes?since="
+        + client.sync_tokens["sale_order"]
+    ),
+    "sale_order_create": lambda client, rng: client.request(
+        "POST", "/api/sale_order", json=order_payload(client, rng)
+    ),
+    "sale_order_ingest": ingest,
+    "batch": batch,
+}
+
+
+def run(client, name, scenario, args):
+    """Run ``scenario`` ``args.requests`` times and return its statistics."""
+    latencies, queries, errors = [], [], []
+
+    def timed(index):
+        rng = random.Random(f"{name}-{index}")
+        start = time.perf_counter()
+        try:
+            resp = scenario(client, rng)
+            resp.content  # noqa: B018 read streamed bodies
+        except requests.RequestException as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            errors.append(f"HTTP {resp.status_code}")
+        match = QUERIES_RE.search(resp.headers.get("Server-Timing", ""))
+        if match:
+            queries.append(int(match.group(1)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(timed, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput": args.requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "queries": sum(queries) / len(queries) if queries else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the changes of throughput and p95 latency against ``baseline``."""
+    print(f"\nCompared to {baseline.get('commit')}:")
+    for name, stats in results["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old or not old["p95_ms"] or not stats["p95_ms"]:
+            continue
+        print(
+            f"{name:>20}: throughput "
+            f"{(stats['throughput'] / old['throughput'] - 1) * 100:+7.1f}%, "
+            f"p95 {(stats['p95_ms'] / old['p95_ms'] - 1) * 100:+7.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--login", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--server-pid", type=int)
+    parser.add_argument("--output", default="bench_api.json")
+    parser.add_argument("--compare")
+    parser.add_argument(
+        "--max-p99",
+        type=float,
+        help="exit with an error when the p99 latency of a scenario is above "
+        "this number of milliseconds",
+    )
+    args = parser.parse_args()
+
+    client = Client(args)
+    results = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "records": {
+            "partners": len(client.partner_ids),
+            "products": len(client.product_ids),
+            "orders": len(client.order_ids),
+        },
+        "scenarios": {},
+    }
+    print(
+        f"{'scenario':>20} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'queries':>8} {'errors':>6}"
+    )
+    for name in args.scenarios:
+        stats = results["scenarios"][name] = run(client, name, SCENARIOS[name], args)
+        print(
+            f"{name:>20} {stats['throughput']:>8.1f} {stats['p50_ms'] or 0:>8.1f} "
+            f"{stats['p95_ms'] or 0:>8.1f} {stats['p99_ms'] or 0:>8.1f} "
+            f"{stats['queries'] or 0:>8.1f} {stats['errors']:>6}"
+        )
+    results["client_peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.server_pid:
+        results["server_peak_rss_kib"] = peak_rss(args.server_pid)
+        print(f"Server peak RSS: {results['server_peak_rss_kib'] / 1024:.1f} MiB")
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(results, json.load(baseline))
+    if args.max_p99:
+        slow = [
+            name
+            for name, stats in results["scenarios"].items()
+            if (stats["p99_ms"] or 0) > args.max_p99
+        ]
+        if slow:
+            sys.exit(f"p99 above {args.max_p99:g} ms: {', '.join(slow)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Compare the throughput of the login and refresh token endpoints.
+
+Usage::
+
+    python3 bench_auth.py --url http://localhost:8069 --login demo \\
+        --password demo --requests 200 --concurrency 8
+
+The login endpoint checks the password hash on every call while the refresh
+endpoint only looks up and rotates a refresh token, so the latter is expected
+to sustain a much higher number of tokens issued per second.
+"""
+
+import argparse
+import queue
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def login(session, args):
+    resp = session.post(
+        f"{args.url}/api/auth_jwt",
+        json={"login": args.login, "password": args.password},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def run(name, worker, args):
+    """Run ``worker`` ``args.requests`` times and print the throughput."""
+    latencies = []
+
+    def timed(index):
+        start = time.perf_counter()
+        worker(index)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(timed, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"{name:>8}: {args.requests / elapsed:8.1f} req/s, "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--login", default="demo")
+    parser.add_argument("--password", default="demo")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    def do_login(index):
+        with requests.Session() as session:
+            login(session, args)
+
+    # Refresh tokens are rotated and must not be used twice: each call takes
+    # a token from the pool and puts back the one it receives.
+    tokens = queue.Queue()
+    for _i in range(args.concurrency):
+        with requests.Session() as session:
+            tokens.put(login(session, args)["refresh_token"])
+
+    def do_refresh(index):
+        refresh_token = tokens.get()
+        with requests.Session() as session:
+            resp = session.post(
+                f"{args.url}/api/auth_jwt/refresh",
+                json={"refresh_token": refresh_token},
+            )
+            resp.raise_for_status()
+            tokens.put(resp.json()["refresh_token"])
+
+    run("login", do_login, args)
+    run("refresh", do_refresh, args)
+
+
+if __name__ == "__main__":
+    main()
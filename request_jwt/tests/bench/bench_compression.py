@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Measure the CPU cost and the size gain of compressing API payloads.
+
+Usage::
+
+    python3 bench_compression.py --sizes 10 100 1000 10000
+
+Synthetic ``/api/sale_order`` payloads of the given number of orders are
+compressed with every available encoding and level; brotli and zstd are only
+measured when the ``brotli`` and ``zstandard`` libraries are installed.
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def make_payload(orders):
+    rng = random.Random(orders)
+    return json.dumps(
+        {
+            "sale_order": [
+                {
+                    "name": f"S{index:05d}",
+                    "date": "2024-01-01 10:00:00",
+                    "id": index,
+                    "partner_id": rng.randint(1, 500),
+                    "amount_total": round(rng.uniform(10, 1000), 2),
+                    "state": rng.choice(["draft", "sale", "done"]),
+                    "lines": [
+                        {
+                            "id": index * 20 + line,
+                            "product_id": rng.randint(1, 200),
+                            "product_name": f"Product {rng.randint(1, 200)}",
+                            "quantity": rng.randint(1, 10),
+                            "price": round(rng.uniform(1, 100), 2),
+                        }
+                        for line in range(rng.randint(5, 20))
+                    ],
+                }
+                for index in range(orders)
+            ],
+            "next": None,
+        }
+    ).encode("utf-8")
+
+
+def codecs():
+    for level in (1, 6, 9):
+        yield "gzip", level, lambda data, level=level: zlib.compress(data, level)
+    if brotli:
+        for level in (1, 4, 11):
+            yield "br", level, lambda data, level=level: brotli.compress(
+                data, quality=level
+            )
+    if zstandard:
+        for level in (1, 3, 10):
+            yield "zstd", level, zstandard.ZstdCompressor(level=level).compress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(
+        f"{'orders':>7} {'raw KiB':>9} {'codec':>6} {'level':>5} "
+        f"{'KiB':>9} {'ratio':>6} {'ms':>8} {'MiB/s':>8}"
+    )
+    for orders in args.sizes:
+        data = make_payload(orders)
+        for name, level, compress in codecs():
+            start = time.perf_counter()
+            for _i in range(args.repeat):
+                compressed = compress(data)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print(
+                f"{orders:>7} {len(data) / 1024:>9.1f} {name:>6} {level:>5} "
+                f"{len(compressed) / 1024:>9.1f} {len(data) / len(compressed):>6.1f} "
+                f"{elapsed * 1000:>8.2f} {len(data) / elapsed / 2**20:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
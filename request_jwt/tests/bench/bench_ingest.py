@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare the sale order creation rate of the single and ingest endpoints.
+
+Usage::
+
+    python3 bench_ingest.py --url http://localhost:8069 --login demo \\
+        --password demo --orders 500 --lines 5 --batch-size 100
+
+Orders are created for the first partner and products returned by the API.
+"""
+
+import argparse
+import json
+import time
+
+import requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--login", default="demo")
+    parser.add_argument("--password", default="demo")
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--commit-every", type=int, default=10)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    resp = session.post(
+        f"{args.url}/api/auth_jwt",
+        json={"login": args.login, "password": args.password},
+    )
+    resp.raise_for_status()
+    session.headers["Authorization"] = "Bearer " + resp.json()["token"]
+    partner = session.get(f"{args.url}/api/res_partner?limit=1&fields=id").json()
+    products = session.get(
+        f"{args.url}/api/product?limit={args.lines}&fields=id"
+    ).json()
+    order = {
+        "partner_id": partner["res_partner"][0]["id"],
+        "lines": [
+            {"product_id": product["id"], "quantity": 1, "price": 10.0}
+            for product in products["products"]
+        ],
+    }
+
+    start = time.perf_counter()
+    for _i in range(args.orders):
+        session.post(f"{args.url}/api/sale_order", json=order).raise_for_status()
+    single = args.orders / (time.perf_counter() - start)
+
+    body = "".join(json.dumps(order) + "\n" for _i in range(args.orders))
+    start = time.perf_counter()
+    resp = session.post(
+        f"{args.url}/api/sale_order/ingest",
+        params={"batch_size": args.batch_size, "commit_every": args.commit_every},
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+        stream=True,
+    )
+    resp.raise_for_status()
+    errors = sum(1 for line in resp.iter_lines() if "error" in json.loads(line))
+    ingest = args.orders / (time.perf_counter() - start)
+
+    print(f"  single: {single:8.1f} orders/s")
+    print(f"  ingest: {ingest:8.1f} orders/s ({errors} errors)")
+    print(f" speedup: {ingest / single:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Measure the serialization and encoding cost of the API payloads per model.
+
+Usage::
+
+    odoo-bin shell -d <database> < bench_serializers.py
+
+The script runs in the ``odoo-bin shell`` namespace, where ``env`` is bound.
+For every serializer registered in ``controllers.serializers``, up to
+``LIMIT`` records are serialized, then encoded with every available JSON
+backend. Times are per record, in microseconds; serialization includes the
+queries, run with a cold cache.
+"""
+
+import time
+
+from odoo.addons.request_jwt.controllers.serializers import SERIALIZERS
+from odoo.addons.request_jwt.tools import encoding
+
+LIMIT = 1000
+REPEAT = 5
+
+
+def bench(env):
+    print(f"{'serializer':>15} {'records':>8} {'backend':>8} {'KiB':>9} {'us/rec':>8}")
+    for name, serializer in SERIALIZERS.items():
+        records = env[serializer.model].search([], limit=LIMIT, order="id")
+        if not records:
+            continue
+        start = time.perf_counter()
+        for _i in range(REPEAT):
+            env.invalidate_all()
+            data = serializer(records)
+        elapsed = (time.perf_counter() - start) / REPEAT / len(records)
+        print(f"{name:>15} {len(records):>8} {'-':>8} {'-':>9} {elapsed * 1e6:>8.1f}")
+        for backend, dumps in encoding.BACKENDS.items():
+            start = time.perf_counter()
+            for _i in range(REPEAT):
+                body = dumps({name: data, "next": None})
+            elapsed = (time.perf_counter() - start) / REPEAT / len(records)
+            print(
+                f"{name:>15} {len(records):>8} {backend:>8} "
+                f"{len(body) / 1024:>9.1f} {elapsed * 1e6:>8.1f}"
+            )
+
+
+bench(env)  # noqa: F821
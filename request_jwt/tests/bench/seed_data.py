@@ -0,0 +1,97 @@
+"""Seed a database with the data volumes used by the API benchmarks.
+
+Usage::
+
+    BENCH_PARTNERS=100000 BENCH_PRODUCTS=10000 BENCH_ORDERS=50000 \\
+        odoo-bin shell -d <database> < seed_data.py
+
+The script runs in the ``odoo-bin shell`` namespace, where ``env`` is bound.
+Records are generated from a fixed random seed (``BENCH_SEED``, 42 by
+default), so two databases seeded with the same volumes hold the same data.
+Seeded records are named ``Bench ...`` and only the missing ones are created,
+so the script can be run again to grow a database. Orders have between 5 and
+20 lines; every batch of ``BATCH_SIZE`` records is committed.
+"""
+
+import os
+import random
+import time
+
+BATCH_SIZE = 1000
+PARTNERS = int(os.environ.get("BENCH_PARTNERS", 100000))
+PRODUCTS = int(os.environ.get("BENCH_PRODUCTS", 10000))
+ORDERS = int(os.environ.get("BENCH_ORDERS", 50000))
+SEED = int(os.environ.get("BENCH_SEED", 42))
+
+
+def seed(model, prefix, count, make_vals):
+    """Create the missing ``count`` records of ``model`` named ``prefix N``."""
+    existing = model.search_count([("name", "=like", f"{prefix} %")])
+    start = time.perf_counter()
+    for first in range(existing, count, BATCH_SIZE):
+        indexes = range(first, min(first + BATCH_SIZE, count))
+        model.create([make_vals(index, f"{prefix} {index:07d}") for index in indexes])
+        model.env.cr.commit()
+        model.env.invalidate_all()
+    print(
+        f"{model._name}: {max(count - existing, 0)} records created in "
+        f"{time.perf_counter() - start:.1f}s, {max(count, existing)} in total"
+    )
+
+
+def main(env):
+    countries = env["res.country"].search([]).ids
+    categories = env["product.category"].search([]).ids
+
+    def partner_vals(index, name):
+        rng = random.Random(SEED * 1000003 + index)
+        return {
+            "name": name,
+            "email": f"bench.partner.{index}@example.com",
+            "is_company": rng.random() < 0.2,
+            "country_id": rng.choice(countries),
+            "city": f"City {rng.randint(1, 500)}",
+            "phone": f"+55 11 {rng.randint(10000000, 99999999)}",
+        }
+
+    def product_vals(index, name):
+        rng = random.Random(SEED * 2000003 + index)
+        return {
+            "name": name,
+            "default_code": f"BENCH-{index:07d}",
+            "list_price": round(rng.uniform(1, 1000), 2),
+            "categ_id": rng.choice(categories),
+            "description_sale": f"Description of {name}",
+        }
+
+    seed(env["res.partner"], "Bench partner", PARTNERS, partner_vals)
+    seed(env["product.product"], "Bench product", PRODUCTS, product_vals)
+    partners = env["res.partner"].search([("name", "=like", "Bench partner %")])
+    products = env["product.product"].search([("name", "=like", "Bench product %")])
+    partner_ids, product_ids = sorted(partners.ids), sorted(products.ids)
+
+    def order_vals(index, name):
+        rng = random.Random(SEED * 3000003 + index)
+        return {
+            "name": name,
+            "partner_id": rng.choice(partner_ids),
+            "date_order": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "order_line": [
+                (
+                    0,
+                    0,
+                    {
+                        "product_id": rng.choice(product_ids),
+                        "product_uom_qty": rng.randint(1, 10),
+                        "price_unit": round(rng.uniform(1, 1000), 2),
+                    },
+                )
+                for _line in range(rng.randint(5, 20))
+            ],
+        }
+
+    seed(env["sale.order"], "Bench order", ORDERS, order_vals)
+    env.cr.execute("ANALYZE")
+
+
+main(env)  # noqa: F821
@@ -0,0 +1,1077 @@
+import datetime
+import decimal
+import gzip
+import json
+import os
+import time
+import uuid
+from unittest.mock import patch
+
+import jwt
+import psycopg2
+from psycopg2.extensions import make_dsn
+from werkzeug.datastructures import Accept
+from werkzeug.wrappers import Response
+
+from odoo import sql_db, tests
+from odoo.exceptions import AccessDenied
+from odoo.modules.registry import Registry
+from odoo.tools import config, mute_logger
+
+from ..controllers.serializers import (
+    PARTNER_FIELDS,
+    SALE_ORDER_FIELDS,
+    SERIALIZERS,
+    _serialize_sale_orders,
+    serialize,
+    serialize_partners,
+    serialize_sale_orders,
+)
+from ..controllers.changes import JWTChangesController
+from ..controllers.products import JWTProductsController
+from ..controllers.res_partner import JWTResPartnerController
+from ..controllers.sale_order import (
+    SALE_ORDER_FILTERS,
+    SALE_ORDER_ORDERS,
+    JWTSaleOrderController,
+)
+from ..controllers.utils import (
+    DEFAULT_LIMIT,
+    ApiError,
+    bulk_create,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    parse_fields,
+    parse_filters,
+    parse_order,
+    search_records,
+    sync_changes,
+)
+from ..models import api_export_job, ir_http
+from ..tools import encoding
+from ..tools.admission import AdmissionControl, parse_limits, parse_route_limits
+from ..tools.catalog import catalog_cache
+from ..tools.changes import CHANNEL_PREFIX
+from ..tools.compression import MIN_SIZE, compress_response
+from ..tools.metrics import SharedMetrics
+from ..tools.preflight import MAX_AGE
+from ..tools.replica import ReplicaRouter
+from ..tools.shared_cache import SharedLRUCache
+from ..tools.token_cache import TokenCache
+
+
+class SharedStoreMixin:
+    def _shared_store(self, store_class, *args, **kwargs):
+        """Return a store of ``store_class`` on a temporary SQLite file.
+
+        - The file has a name of its own and is removed when the test ends.
+        """
+        store = store_class(f"test_{uuid.uuid4().hex}", *args, **kwargs)
+        self.addCleanup(lambda: os.path.exists(store.path) and os.remove(store.path))
+        return store
+
+
+@tests.tagged("post_install", "-at_install")
+class TestPagination(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partners = cls.env["res.partner"].create(
+            [{"name": f"Paginated partner {i}"} for i in range(7)]
+        )
+        cls.domain = [("id", "in", cls.partners.ids)]
+
+    def test_cursor_roundtrip(self):
+        cursor = encode_cursor({"id": 42})
+        self.assertEqual(decode_cursor(cursor), {"id": 42})
+        with self.assertRaises(ApiError):
+            decode_cursor("not a cursor")
+
+    def test_walk_all_pages(self):
+        """Walking the pages returns every record exactly once, in id order."""
+        Partner = self.env["res.partner"]
+        seen, after, pages = [], None, 0
+        while True:
+            records, after = paginate(Partner, self.domain, limit=3, after=after)
+            seen += records.ids
+            pages += 1
+            if not after:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, sorted(self.partners.ids))
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ApiError):
+            paginate(self.env["res.partner"], self.domain, limit="0")
+        with self.assertRaises(ApiError):
+            paginate(self.env["res.partner"], self.domain, limit="ten")
+
+    def test_walk_ordered_pages(self):
+        """Ties on the order field are broken by id, in the same direction."""
+        self.partners[:4].write({"name": "Same name"})
+        Partner = self.env["res.partner"]
+        order = parse_order("-name", {"name": "name"})
+        seen, after = [], None
+        while True:
+            records, after = paginate(
+                Partner, self.domain, limit=2, after=after, order=order
+            )
+            seen += records.ids
+            if not after:
+                break
+        expected = sorted(self.partners, key=lambda p: (p.name, p.id), reverse=True)
+        self.assertEqual(seen, [partner.id for partner in expected])
+        # A cursor is only valid for the order it was built with.
+        records, after = paginate(Partner, self.domain, limit=2, order=order)
+        with self.assertRaises(ApiError):
+            paginate(Partner, self.domain, limit=2, after=after)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestFilters(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env["res.partner"].create({"name": "Filtered partner"})
+        cls.orders = cls.env["sale.order"].create(
+            [
+                {"partner_id": cls.partner.id, "date_order": f"2024-01-0{day}"}
+                for day in (1, 2, 3)
+            ]
+        )
+
+    def _clone(self, record, count, values):
+        """Insert ``count`` copies of ``record`` with SQL, for realistic plans.
+        - ``values`` maps columns to SQL expressions of the copy number ``n``,
+          with ``%`` escaped as ``%%``.
+        """
+        cr = self.env.cr
+        cr.execute(
+            "SELECT column_name FROM information_schema.columns"
+            " WHERE table_schema = current_schema() AND table_name = %s"
+            " AND column_name != 'id' AND is_generated = 'NEVER'",
+            [record._table],
+        )
+        columns = [row[0] for row in cr.fetchall()]
+        cr.execute(
+            f"INSERT INTO {record._table} ({', '.join(columns)})"
+            f" SELECT {', '.join(values.get(column, column) for column in columns)}"
+            f" FROM {record._table}, generate_series(1, %s) n WHERE id = %s",
+            [count, record.id],
+        )
+        cr.execute(f"ANALYZE {record._table}")
+
+    def _explain(self, model, domain, order):
+        query = model._search(domain, limit=DEFAULT_LIMIT + 1, order=order)
+        sql, params = query.select()
+        self.env.cr.execute("EXPLAIN " + sql, params)
+        return "\n".join(row[0] for row in self.env.cr.fetchall())
+
+    def test_sale_order_filters(self):
+        params = {
+            "partner_id": str(self.partner.id),
+            "date_from": "2024-01-02",
+            "date_to": "2024-01-02",
+            "unknown": "ignored",
+        }
+        domain = parse_filters(params, SALE_ORDER_FILTERS)
+        self.assertEqual(self.env["sale.order"].search(domain), self.orders[1])
+        with self.assertRaises(ApiError):
+            parse_filters({"partner_id": "abc"}, SALE_ORDER_FILTERS)
+        with self.assertRaises(ApiError):
+            parse_order("-unknown", SALE_ORDER_ORDERS)
+
+    def test_index_scans(self):
+        other = self.env["res.partner"].create({"name": "Other partner"})
+        country, other_country = self.env.ref("base.br"), self.env.ref("base.us")
+        self._clone(
+            self.orders[0],
+            20000,
+            {
+                "partner_id": f"CASE WHEN n %% 100 = 0 THEN {self.partner.id}"
+                f" ELSE {other.id} END",
+                "date_order": "date_order - n * interval '1 hour'",
+                "state": "CASE WHEN n %% 50 = 0 THEN 'sale' ELSE 'draft' END",
+            },
+        )
+        self._clone(
+            other,
+            20000,
+            {
+                "country_id": f"CASE WHEN n %% 500 = 0 THEN {country.id}"
+                f" ELSE {other_country.id} END",
+                "is_company": "n %% 2 = 0",
+            },
+        )
+        plan = self._explain(
+            self.env["sale.order"],
+            [("partner_id", "=", self.partner.id)],
+            "date_order desc, id desc",
+        )
+        self.assertIn("sale_order_partner_id_date_order_index", plan)
+        plan = self._explain(
+            self.env["sale.order"], [("state", "in", ["sale"])], "date_order, id"
+        )
+        self.assertIn("sale_order_state_date_order_index", plan)
+        plan = self._explain(
+            self.env["res.partner"],
+            [("country_id", "=", country.id), ("is_company", "=", True)],
+            "id",
+        )
+        self.assertIn("res_partner_country_id_is_company_index", plan)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSearch(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partners = cls.env["res.partner"].create(
+            [
+                {"name": "Searched Zyxwv Ltd", "email": "contact@zyxwv.example"},
+                {"name": "Zyxwv", "email": "zyxwv@example.com"},
+                {"name": "Other", "vat": "ZYXWV-123"},
+            ]
+        )
+        cls.product = cls.env["product.product"].create(
+            {"name": "Searched Qwzrt", "default_code": "QWZRT-1"}
+        )
+
+    def test_ranking(self):
+        partners = search_records(self.env["res.partner"], "zyxwv")
+        self.assertEqual(set(partners.ids), set(self.partners.ids))
+        # Prefix matches first, then by similarity and id.
+        self.assertEqual(partners[0], self.partners[1])
+        self.assertEqual(partners[-1], self.partners[0])
+        partners = search_records(self.env["res.partner"], "zyxwv", limit="1")
+        self.assertEqual(partners, self.partners[1])
+        products = search_records(self.env["product.product"], "qwzrt")
+        self.assertEqual(products, self.product)
+        with self.assertRaises(ApiError):
+            search_records(self.env["res.partner"], "zy")
+
+    def test_product_name_prefix(self):
+        # Created first, so that only the prefix rank orders the results.
+        contains, prefix = self.env["product.product"].create(
+            [{"name": "Bolt of Kvbnm"}, {"name": "Kvbnm bolt"}]
+        )
+        products = search_records(self.env["product.product"], "kvbnm")
+        self.assertEqual(products.ids, [prefix.id, contains.id])
+
+    def test_archived(self):
+        self.partners[1].active = False
+        partners = search_records(self.env["res.partner"], "zyxwv")
+        self.assertNotIn(self.partners[1], partners)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestChanges(tests.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.env.cr.execute("SELECT COALESCE(max(id), 0) FROM bus_bus")
+        self.since = self.env.cr.fetchone()[0]
+
+    def _send(self):
+        """Run the pre-commit hooks and return the change notifications."""
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+        return (
+            self.env["bus.bus"]
+            .sudo()
+            .search_read(
+                [("id", ">", self.since), ("channel", "like", CHANNEL_PREFIX)],
+                ["message"],
+                order="id",
+            )
+        )
+
+    def test_coalesced_changes(self):
+        partners = self.env["res.partner"].create(
+            [{"name": "Changed partner"}, {"name": "Deleted partner"}]
+        )
+        partners.write({"city": "Recife"})
+        partners[0].write({"city": "Olinda"})
+        partners[1].unlink()
+        notifications = self._send()
+        self.assertEqual(len(notifications), 1)
+        data = JWTChangesController()._collect_changes(
+            self.env, notifications, self.since
+        )
+        self.assertEqual(data["changes"], {"res_partner": [partners[0].id]})
+        self.assertEqual(data["deleted"], {"res_partner": [partners[1].id]})
+        self.assertEqual(data["next"], str(notifications[-1]["id"]))
+
+    def test_order_lines(self):
+        partner = self.env["res.partner"].create({"name": "Order partner"})
+        order = self.env["sale.order"].create({"partner_id": partner.id})
+        self._send()
+        self.since = self.env["bus.bus"].sudo().search([], order="id desc", limit=1).id
+        product = self.env["product.product"].create({"name": "Line product"})
+        order.write({"order_line": [(0, 0, {"product_id": product.id})]})
+        data = JWTChangesController()._collect_changes(
+            self.env, self._send(), self.since
+        )
+        self.assertEqual(data["changes"]["sale_order"], order.ids)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSparseFields(tests.TransactionCase):
+    def test_parse_fields(self):
+        self.assertIsNone(parse_fields("", PARTNER_FIELDS))
+        self.assertEqual(parse_fields("name, id", PARTNER_FIELDS), ["name", "id"])
+        with self.assertRaises(ApiError):
+            parse_fields("id,password", PARTNER_FIELDS)
+
+    def test_serialize_subset(self):
+        partner = self.env["res.partner"].create(
+            {"name": "Sparse partner", "country_id": self.env.ref("base.br").id}
+        )
+        self.assertEqual(
+            serialize_partners(partner, fields=["id", "name"]),
+            [{"id": partner.id, "name": "Sparse partner"}],
+        )
+        data = serialize_partners(partner)[0]
+        self.assertEqual(list(data), list(PARTNER_FIELDS))
+        self.assertEqual(data["country"]["name"], partner.country_id.name)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSharedCache(SharedStoreMixin, tests.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = self._shared_store(SharedLRUCache, max_bytes=10)
+
+    def test_lru_eviction(self):
+        self.cache.set("db", "a", b"123456")
+        self.cache.set("db", "b", b"123456")
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), b"123456")
+        stats = self.cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_invalidate_namespace(self):
+        self.cache.set("db", "a", b"1")
+        self.cache.set("other", "b", b"2")
+        self.cache.invalidate("db")
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), b"2")
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_stale_fill(self):
+        """A value computed before an invalidation is not stored."""
+        generation = self.cache.generation("db")
+        self.cache.invalidate("db")
+        self.cache.set("db", "a", b"1", generation)
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("db", "a", b"1", self.cache.generation("db"))
+        self.assertEqual(self.cache.get("a"), b"1")
+
+
+@tests.tagged("post_install", "-at_install")
+class TestAdmission(SharedStoreMixin, tests.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.admission = self._shared_store(
+            AdmissionControl,
+            parse_limits("1", "2", "0"),
+            parse_route_limits("/api/slow=0/0/1, /api/free=0"),
+        )
+
+    def test_rate_limit(self):
+        for _i in range(2):
+            self.assertEqual(self.admission.acquire("db", "1", "/api/a"), (None, None))
+        self.assertEqual(self.admission.acquire("db", "1", "/api/a"), (None, 1))
+        # Subjects and routes have buckets of their own.
+        self.assertIsNone(self.admission.acquire("db", "2", "/api/a")[1])
+        self.assertIsNone(self.admission.acquire("db", "1", "/api/b")[1])
+        for _i in range(5):
+            self.assertIsNone(self.admission.acquire("db", "1", "/api/free")[1])
+
+    def test_concurrency(self):
+        slot, retry_after = self.admission.acquire("db", "1", "/api/slow")
+        self.assertIsNone(retry_after)
+        self.assertEqual(self.admission.acquire("db", "1", "/api/slow"), (None, 1))
+        self.admission.release(slot)
+        slot, retry_after = self.admission.acquire("db", "1", "/api/slow")
+        self.assertIsNone(retry_after)
+        self.admission.slot_timeout = -1
+        self.assertIsNone(self.admission.acquire("db", "1", "/api/slow")[1])
+
+    def test_subject_concurrency(self):
+        self.admission.subject_concurrency = 2
+        slot, _retry_after = self.admission.acquire("db", "1", "/api/free")
+        self.assertIsNone(self.admission.acquire("db", "1", "/api/other")[1])
+        self.assertEqual(self.admission.acquire("db", "1", "/api/free"), (None, 1))
+        # Other subjects, and the sub-requests of a batch, are not limited.
+        self.assertIsNone(self.admission.acquire("db", "2", "/api/free")[1])
+        self.assertIsNone(
+            self.admission.acquire("db", "1", "/api/free", nested=True)[1]
+        )
+        self.admission.release(slot)
+        self.assertIsNone(self.admission.acquire("db", "1", "/api/free")[1])
+
+
+@tests.tagged("post_install", "-at_install")
+class TestMetrics(SharedStoreMixin, tests.TransactionCase):
+    def test_workers_aggregation(self):
+        metrics = self._shared_store(SharedMetrics)
+        workers = [metrics, SharedMetrics(metrics.name)]
+        timings = {"auth": 0.001, "sql": 0.002, "queries": 3, "total": 0.02}
+        for worker in workers:
+            worker.observe("/api/product", 200, timings)
+            worker.flush()
+        text = workers[0].render()
+        self.assertIn(
+            'request_jwt_request_duration_seconds_bucket{route="/api/product",'
+            'le="0.025"} 2',
+            text,
+        )
+        self.assertIn(
+            'request_jwt_request_duration_seconds_bucket{route="/api/product",'
+            'le="0.01"} 0',
+            text,
+        )
+        self.assertIn('request_jwt_sql_queries_total{route="/api/product"} 6', text)
+
+    def test_label_escaping(self):
+        metrics = self._shared_store(SharedMetrics)
+        timings = {"total": 0.001, "queries": 1}
+        metrics.observe('/api/a"b\\c', 200, timings)
+        metrics.flush()
+        self.assertIn(
+            'request_jwt_responses_total{route="/api/a\\"b\\\\c",status="200"} 1',
+            metrics.render(),
+        )
+
+
+@tests.tagged("post_install", "-at_install")
+class TestReplica(tests.TransactionCase):
+    def _replica_dsn(self):
+        """Return the configured replica, or the primary database server."""
+        dsn = config.get("request_jwt_replica_dsn")
+        if dsn:
+            return dsn
+        info = dict(sql_db.connection_info_for(self.env.cr.dbname)[1])
+        info.pop("database", None)
+        info.pop("dbname", None)
+        return make_dsn(**info)
+
+    def test_read_only_cursor(self):
+        router = ReplicaRouter(self._replica_dsn(), max_lag=10, maxconn=2)
+        cr = router.cursor(self.env.cr.dbname)
+        self.assertIsNotNone(cr)
+        with cr:
+            cr.execute("SELECT COUNT(*) FROM res_partner")
+            self.assertTrue(cr.fetchone()[0])
+            with self.assertRaises(psycopg2.Error), mute_logger("odoo.sql_db"):
+                cr.execute("UPDATE res_partner SET name = name WHERE id = 1")
+
+    def test_fallback(self):
+        router = ReplicaRouter("host=/nonexistent port=1", max_lag=10, maxconn=2)
+        with mute_logger("odoo.addons.request_jwt.tools.replica"):
+            self.assertIsNone(router.cursor(self.env.cr.dbname))
+        self.assertFalse(router._state[self.env.cr.dbname][0])
+        self.assertIsNone(ReplicaRouter(None, 10, 2).cursor(self.env.cr.dbname))
+
+
+@tests.tagged("post_install", "-at_install")
+class TestTokenCache(tests.TransactionCase):
+    def test_expiry_and_sequence(self):
+        cache = TokenCache(max_size=2)
+        cache.set("a", 1, time.time() + 60, "value")
+        self.assertEqual(cache.get("a", 1), "value")
+        # The registry caches were cleared since the token was cached.
+        self.assertIsNone(cache.get("a", 2))
+        cache.set("b", 1, time.time() - 1, "value")
+        self.assertIsNone(cache.get("b", 1))
+
+    def test_lru(self):
+        cache = TokenCache(max_size=2)
+        for key in "abc":
+            cache.set(key, 1, time.time() + 60, key)
+        self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(cache.get("c", 1), "c")
+
+
+@tests.tagged("post_install", "-at_install")
+class TestRefreshToken(tests.TransactionCase):
+    def test_rotation(self):
+        RefreshToken = self.env["jwt.refresh.token"]
+        user = self.env.ref("base.user_demo")
+        token = RefreshToken._issue(user)
+        refreshed_user, new_token = RefreshToken._rotate(token)
+        self.assertEqual(refreshed_user, user)
+        self.assertNotEqual(new_token, token)
+        # Reusing a consumed token revokes the whole family.
+        with self.assertRaises(AccessDenied):
+            RefreshToken._rotate(token)
+        with self.assertRaises(AccessDenied):
+            RefreshToken._rotate(new_token)
+
+    def test_revoke(self):
+        RefreshToken = self.env["jwt.refresh.token"]
+        token = RefreshToken._issue(self.env.ref("base.user_demo"))
+        RefreshToken._revoke(token)
+        with self.assertRaises(AccessDenied):
+            RefreshToken._rotate(token)
+        with self.assertRaises(AccessDenied):
+            RefreshToken._rotate("unknown")
+
+
+@tests.tagged("post_install", "-at_install")
+class TestTokenIssuing(tests.TransactionCase):
+    def test_issue_token_without_query(self):
+        Validator = self.env["auth.jwt.validator"]
+        Validator._issue_token("api", {"user_id": 1})
+        start = self.env.cr.sql_log_count
+        token = Validator._issue_token("api", {"user_id": 1})
+        self.assertEqual(self.env.cr.sql_log_count, start)
+        payload = jwt.decode(token, options={"verify_signature": False})
+        self.assertEqual(payload["user_id"], 1)
+        # Writing the validator invalidates the cached parameters.
+        Validator._get_validator_by_name("api").write({"issuer": "newissuer"})
+        token = Validator._issue_token("api", {"user_id": 1})
+        payload = jwt.decode(token, options={"verify_signature": False})
+        self.assertEqual(payload["iss"], "newissuer")
+
+
+@tests.tagged("post_install", "-at_install")
+class TestBulkCreate(tests.TransactionCase):
+    def test_bad_rows_are_reported(self):
+        rows = [
+            {"name": "Bulk 0", "email": "bulk0@example.com"},
+            {"name": "Bulk 1"},
+            ApiError("Invalid JSON."),
+            {"name": "Bulk 3", "email": "bulk3@example.com", "country_id": "x"},
+            {"name": "Bulk 4", "email": "bulk4@example.com"},
+        ]
+
+        def prepare_vals(row):
+            vals = JWTResPartnerController()._prepare_partner_vals(row)
+            # Let an invalid value reach the ORM to fail a whole batch.
+            if "country_id" in row:
+                vals["country_id"] = row["country_id"]
+            return vals
+
+        results = bulk_create(self.env["res.partner"], rows, prepare_vals, 2)
+        self.assertEqual([result["index"] for result in results], list(range(5)))
+        self.assertEqual(
+            ["id" in result for result in results], [True, False, False, False, True]
+        )
+        self.assertEqual(results[1]["error"], "Missing name or email.")
+        partners = self.env["res.partner"].browse(
+            [result["id"] for result in results if "id" in result]
+        )
+        self.assertEqual(partners.mapped("name"), ["Bulk 0", "Bulk 4"])
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSaleOrderIngestion(tests.TransactionCase):
+    def test_ingest_batch(self):
+        partner = self.env["res.partner"].create({"name": "Ingested customer"})
+        product = self.env["product.product"].create({"name": "Ingested product"})
+        line = {"product_id": product.id, "quantity": 3, "price": 5.0}
+        batch = [
+            (10, {"name": "ING/1", "partner_id": partner.id, "lines": [line]}),
+            (11, {"name": "ING/2", "partner_id": 0, "lines": [line]}),
+            (12, {"name": "ING/3", "partner_id": partner.id, "lines": ["x"]}),
+            (13, ApiError("Invalid JSON.")),
+            (14, {"name": "ING/5", "partner_id": partner.id, "lines": [line]}),
+            (15, {"name": "ING/6", "partner_id": True, "lines": [line]}),
+        ]
+        results = JWTSaleOrderController()._ingest_batch(self.env, batch)
+        self.assertEqual([result["index"] for result in results], list(range(10, 16)))
+        self.assertEqual(results[5]["error"], "Unknown partner True.")
+        self.assertEqual(results[1]["error"], "Unknown partner 0.")
+        self.assertEqual(results[2]["error"], "Invalid sale order.")
+        self.assertEqual(results[3]["error"], "Invalid JSON.")
+        orders = self.env["sale.order"].browse([results[0]["id"], results[4]["id"]])
+        self.assertEqual(orders.mapped("name"), ["ING/1", "ING/5"])
+        self.assertEqual(orders.order_line.mapped("product_uom_qty"), [3, 3])
+
+
+@tests.tagged("post_install", "-at_install")
+class TestExportJob(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env["res.partner"].create({"name": "Exported customer"})
+        product = cls.env["product.product"].create({"name": "Exported product"})
+        cls.orders = cls.env["sale.order"].create(
+            [
+                {
+                    "partner_id": cls.partner.id,
+                    "order_line": [
+                        (0, 0, {"product_id": product.id, "product_uom_qty": qty})
+                        for qty in range(1, lines + 1)
+                    ],
+                }
+                for lines in (1, 2, 3)
+            ]
+        )
+
+    def setUp(self):
+        super().setUp()
+        # Batches are committed by the cron, not by the test transaction.
+        self.patch(self.env.cr, "commit", lambda: None)
+        self.patch(api_export_job, "EXPORT_BATCH_SIZE", 2)
+
+    def _export(self, file_format):
+        domain = [("partner_id", "=", self.partner.id)]
+        job = self.env["api.export.job"]._enqueue(
+            self.env.user, "sale.order", "sale_order", domain, file_format
+        )
+        self.addCleanup(job.unlink)
+        self.assertTrue(job._run(time.monotonic() + 60))
+        self.assertEqual(job._get_status()["progress"], 1.0)
+        self.assertEqual(job.exported_count, 3)
+        with gzip.open(job._get_file_path(), "rt") as exported:
+            return exported.read().splitlines()
+
+    def test_ndjson(self):
+        rows = [json.loads(line) for line in self._export("ndjson")]
+        self.assertEqual([row["id"] for row in rows], self.orders.ids)
+        self.assertEqual([len(row["lines"]) for row in rows], [1, 2, 3])
+
+    def test_csv(self):
+        lines = self._export("csv")
+        self.assertTrue(lines[0].startswith("id,name,date"))
+        self.assertEqual(len(lines), 1 + 6)
+
+    def test_time_budget(self):
+        for cron_limit, limit, budget in ((-1, 120, 90), (60, 120, 30), (0, 0, 240)):
+            options = {"limit_time_real_cron": cron_limit, "limit_time_real": limit}
+            with patch.dict(config.options, options):
+                self.assertEqual(api_export_job.export_time_budget(), budget)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSyncChanges(tests.TransactionCase):
+    def test_delta_with_tombstones(self):
+        Partner = self.env["res.partner"]
+        kept, archived, deleted = Partner.create(
+            [{"name": f"Synced partner {i}"} for i in range(3)]
+        )
+        archived.active = False
+        deleted_id = deleted.id
+        deleted.unlink()
+        since = encode_cursor({"t": str(self.env.cr.now())})
+
+        def change_domain(date):
+            return [("write_date", ">", date), ("name", "like", "Synced partner")]
+
+        records, removed_ids, next_cursor, sync_token = sync_changes(
+            Partner, change_domain, since=since, limit=1
+        )
+        self.assertEqual(records, kept)
+        self.assertEqual(removed_ids, [])
+        self.assertTrue(next_cursor)
+        self.assertIsNone(sync_token)
+        records, removed_ids, next_cursor, sync_token = sync_changes(
+            Partner, change_domain, after=next_cursor, limit=1
+        )
+        self.assertFalse(records)
+        self.assertIn(archived.id, removed_ids)
+        self.assertIn(deleted_id, removed_ids)
+        self.assertIsNone(next_cursor)
+        self.assertTrue(sync_token)
+
+    def test_deleted_template(self):
+        template = self.env["product.template"].create({"name": "Deleted template"})
+        variant_id = template.product_variant_id.id
+        template.unlink()
+        self.assertIn(
+            variant_id,
+            self.env["api.sync.tombstone"]._get_deleted_ids(
+                "product.product", "2000-01-01 00:00:00"
+            ),
+        )
+
+    def test_tombstone_company(self):
+        company = self.env["res.company"].create({"name": "Tombstone company"})
+        partner = self.env["res.partner"].create(
+            {"name": "Company partner", "company_id": company.id}
+        )
+        partner_id = partner.id
+        partner.unlink()
+        Tombstone = self.env["api.sync.tombstone"]
+        since = "2000-01-01 00:00:00"
+        self.assertNotIn(partner_id, Tombstone._get_deleted_ids("res.partner", since))
+        self.env.user.company_ids |= company
+        self.assertIn(
+            partner_id,
+            Tombstone.with_company(company)._get_deleted_ids("res.partner", since),
+        )
+
+    def test_deleted_order_line(self):
+        partner = self.env["res.partner"].create({"name": "Line partner"})
+        product = self.env["product.product"].create({"name": "Line product"})
+        order = self.env["sale.order"].create(
+            {
+                "partner_id": partner.id,
+                "order_line": [
+                    (0, 0, {"product_id": product.id, "price_unit": 0})
+                    for _i in range(2)
+                ],
+            }
+        )
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE sale_order SET write_date = '2000-01-01' WHERE id = %s", [order.id]
+        )
+        order.invalidate_recordset(["write_date"])
+        order.order_line[0].unlink()
+        self.assertEqual(order.write_date, self.env.cr.now())
+
+    def test_expired_token(self):
+        since = encode_cursor({"t": "2000-01-01 00:00:00"})
+        with self.assertRaises(ApiError) as error:
+            sync_changes(self.env["res.partner"], lambda date: [], since=since)
+        self.assertEqual(error.exception.status, 410)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestCompression(tests.TransactionCase):
+    accept_gzip = Accept([("gzip", 1)])
+
+    def test_buffered(self):
+        data = b"x" * MIN_SIZE
+        response = Response(data)
+        response.set_etag("abc")
+        compress_response(response, self.accept_gzip)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.get_data()), data)
+        self.assertEqual(response.get_etag(), ("abc-gzip", False))
+        # Small bodies and clients not accepting gzip get the raw body.
+        response = compress_response(Response(b"x"), self.accept_gzip)
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = compress_response(Response(data), Accept([]))
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_streamed(self):
+        response = Response(iter([b"a" * 10, "b" * 10]))
+        compress_response(response, self.accept_gzip)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        body = b"".join(response.response)
+        self.assertEqual(gzip.decompress(body), b"a" * 10 + b"b" * 10)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestEncoding(tests.TransactionCase):
+    def test_backends(self):
+        data = {
+            "date": datetime.date(2024, 1, 2),
+            "datetime": datetime.datetime(2024, 1, 2, 3, 4, 5),
+            "amount": decimal.Decimal("1.5"),
+            "name": "Café",
+            "ids": [1, 2],
+        }
+        expected = {
+            "date": "2024-01-02",
+            "datetime": "2024-01-02 03:04:05",
+            "amount": 1.5,
+            "name": "Café",
+            "ids": [1, 2],
+        }
+        for dumps in encoding.BACKENDS.values():
+            self.assertEqual(json.loads(dumps(data)), expected)
+
+    def test_registry(self):
+        partner = self.env["res.partner"].create({"name": "Registered"})
+        serializer = SERIALIZERS["partner_detail"]
+        self.assertEqual(serializer.model, "res.partner")
+        self.assertEqual(
+            serialize("partner_detail", partner, fields=["id", "name"]),
+            [{"id": partner.id, "name": "Registered"}],
+        )
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSaleOrderSerializer(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partner = cls.env["res.partner"].create({"name": "Serialized customer"})
+        products = cls.env["product.product"].create(
+            [{"name": f"Serialized product {i}"} for i in range(5)]
+        )
+        cls.orders = cls.env["sale.order"].create(
+            [
+                {
+                    "partner_id": partner.id,
+                    "order_line": [
+                        (0, 0, {"product_id": product.id, "product_uom_qty": 2})
+                        for product in products[: 1 + i % 5]
+                    ],
+                }
+                for i in range(30)
+            ]
+        )
+
+    def _count_queries(self, orders):
+        self.env.invalidate_all()
+        start = self.env.cr.sql_log_count
+        serialize_sale_orders(orders)
+        return self.env.cr.sql_log_count - start
+
+    def test_payload(self):
+        order = self.orders[2]
+        data = serialize_sale_orders(order)[0]
+        self.assertEqual(data["id"], order.id)
+        self.assertEqual(data["partner_id"], order.partner_id.id)
+        self.assertEqual(
+            [line["product_name"] for line in data["lines"]],
+            order.order_line.product_id.mapped("name"),
+        )
+
+    def test_query_budget(self):
+        """The number of queries does not grow with the number of orders."""
+        few = self._count_queries(self.orders[:2])
+        many = self._count_queries(self.orders)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 6)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestSaleOrderSummary(tests.TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        partner = cls.env["res.partner"].create({"name": "Summarized customer"})
+        cls.products = cls.env["product.product"].create(
+            [{"name": f"Summarized product {i}"} for i in range(3)]
+        )
+        cls.orders = cls.env["sale.order"].create(
+            [
+                {
+                    "partner_id": partner.id,
+                    "order_line": [
+                        (0, 0, {"product_id": product.id, "product_uom_qty": 2})
+                        for product in cls.products[: 1 + i % 3]
+                    ],
+                }
+                for i in range(10)
+            ]
+        )
+        cls._commit_summaries()
+
+    @classmethod
+    def _commit_summaries(cls):
+        cls.env.flush_all()
+        cls.env.cr.precommit.run()
+        cls.env.invalidate_all()
+
+    def _summary(self, order):
+        return self.env["api.sale.order.summary"].search([("order_id", "=", order.id)])
+
+    def test_same_payload(self):
+        summary = self._summary(self.orders[4])
+        self.assertEqual(summary.line_count, 2)
+        self.assertEqual(summary.amount_total, self.orders[4].amount_total)
+        self.assertEqual(
+            serialize_sale_orders(self.orders),
+            _serialize_sale_orders(self.orders, list(SALE_ORDER_FIELDS)),
+        )
+        start = self.env.cr.sql_log_count
+        serialize_sale_orders(self.orders)
+        self.assertEqual(self.env.cr.sql_log_count - start, 1)
+
+    def test_refresh_on_writes(self):
+        order = self.orders[0]
+        order.order_line.product_uom_qty = 5
+        self.products[0].name = "Renamed product"
+        # Written orders are read from the ORM until the commit, like the
+        # orders with lines of a renamed product.
+        self.assertEqual(serialize_sale_orders(order)[0]["lines"][0]["quantity"], 5)
+        self.assertEqual(
+            serialize_sale_orders(self.orders[3])[0]["lines"][0]["product_name"],
+            "Renamed product",
+        )
+        self._commit_summaries()
+        self.assertEqual(self._summary(order).amount_total, order.amount_total)
+        line = serialize_sale_orders(order)[0]["lines"][0]
+        self.assertEqual(line["quantity"], 5)
+        self.assertEqual(line["product_name"], "Renamed product")
+        self.assertEqual(
+            self._summary(self.orders[3]).lines[0]["product_name"]["en_US"],
+            "Renamed product",
+        )
+
+    def test_refresh_on_translation(self):
+        self.env["res.lang"]._activate_lang("fr_FR")
+        template = self.products[1].product_tmpl_id
+        template.update_field_translations("name", {"fr_FR": "Produit traduit"})
+        self._commit_summaries()
+        line = self._summary(self.orders[1]).lines[1]
+        self.assertEqual(line["product_name"]["fr_FR"], "Produit traduit")
+
+    def test_rebuild(self):
+        self.env.cr.execute("DELETE FROM api_sale_order_summary")
+        self.env["api.sale.order.summary"]._rebuild()
+        self.assertEqual(len(self._summary(self.orders[1]).lines), 2)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestConditionalGet(tests.HttpCase):
+    def _get_headers(self, **headers):
+        validator = self.env["auth.jwt.validator"]._get_validator_by_name("api")
+        payload = {
+            "aud": validator.audience,
+            "iss": validator.issuer,
+            "exp": time.time() + 60,
+        }
+        token = jwt.encode(
+            payload, key=validator.secret_key, algorithm=validator.secret_algorithm
+        )
+        return dict(headers, Authorization="Bearer " + token)
+
+    def test_product_list_not_modified(self):
+        resp = self.url_open("/api/product?limit=5", headers=self._get_headers())
+        resp.raise_for_status()
+        etag = resp.headers["ETag"]
+        self.assertTrue(resp.headers["Last-Modified"])
+        resp = self.url_open(
+            "/api/product?limit=5",
+            headers=self._get_headers(**{"If-None-Match": etag}),
+        )
+        self.assertEqual(resp.status_code, 304)
+        self.assertFalse(resp.content)
+        # Another page is another representation.
+        resp = self.url_open(
+            "/api/product?limit=6",
+            headers=self._get_headers(**{"If-None-Match": etag}),
+        )
+        self.assertEqual(resp.status_code, 200)
+        # A new product changes the catalog.
+        self.env["product.product"].create({"name": "Conditional product"})
+        resp = self.url_open(
+            "/api/product?limit=5",
+            headers=self._get_headers(**{"If-None-Match": etag}),
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+    def test_catalog_stale_fill(self):
+        """A response read from an older snapshot is not served afterwards."""
+        Product = self.env["product.product"]
+        Product.create({"name": "Stale fill 1", "default_code": "STALE-FILL"})
+        path = "/api/product?default_code=STALE-FILL&fields=name"
+        validators = JWTProductsController._cache_validators
+
+        def cache_validators(controller, *args):
+            result = validators(controller, *args)
+            # A write committed after the snapshot invalidates the cache, then
+            # the response is stored with the new generation.
+            catalog_cache.invalidate(self.env.cr.dbname)
+            return result
+
+        with patch.object(JWTProductsController, "_cache_validators", cache_validators):
+            resp = self.url_open(path, headers=self._get_headers())
+        self.assertEqual(len(resp.json()["products"]), 1)
+        # Post-commit invalidations do not run in tests: the first response is
+        # still cached, under the ETag of its snapshot.
+        Product.create({"name": "Stale fill 2", "default_code": "STALE-FILL"})
+        resp = self.url_open(path, headers=self._get_headers())
+        self.assertEqual(len(resp.json()["products"]), 2)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestMetricsHttp(SharedStoreMixin, tests.HttpCase):
+    _get_headers = TestConditionalGet._get_headers
+
+    def setUp(self):
+        super().setUp()
+        self.metrics = self._shared_store(SharedMetrics)
+        self.patch(ir_http, "api_metrics", self.metrics)
+
+    def test_server_timing(self):
+        resp = self.url_open("/api/product?limit=5", headers=self._get_headers())
+        resp.raise_for_status()
+        timing = resp.headers["Server-Timing"]
+        # The page may come from the catalog cache, without serialization.
+        for phase in ("auth", "sql", "total"):
+            self.assertIn(f"{phase};dur=", timing)
+
+    def test_auth_failure(self):
+        resp = self.url_open("/api/product?limit=5")
+        self.assertEqual(resp.status_code, 401)
+        self.metrics.flush()
+        self.assertIn(
+            'request_jwt_responses_total{route="/api/product",status="401"} 1',
+            self.metrics.render(),
+        )
+
+
+@tests.tagged("post_install", "-at_install")
+class TestBatch(SharedStoreMixin, tests.HttpCase):
+    _get_headers = TestConditionalGet._get_headers
+
+    def test_batch(self):
+        partner = self.env["res.partner"].create({"name": "Batched partner"})
+        requests = [
+            {"path": f"/api/res_partner/{partner.id}?fields=id,name"},
+            {"path": "/api/product?limit=1&fields=id"},
+            {"path": "/api/product/0"},
+            {"path": "/api/nowhere"},
+            {"path": "/api/batch", "method": "POST", "body": []},
+            {"path": "/api/res_partner", "method": "POST", "body": {"name": "x"}},
+            {"path": "/api/changes?since=1"},
+        ]
+        resp = self.url_open(
+            "/api/batch", data=json.dumps(requests), headers=self._get_headers()
+        )
+        resp.raise_for_status()
+        responses = resp.json()["responses"]
+        self.assertEqual(
+            [item["status"] for item in responses], [200, 200, 404, 404, 403, 200, 403]
+        )
+        self.assertEqual(
+            responses[0]["body"],
+            {"res_partner": {"id": partner.id, "name": "Batched partner"}},
+        )
+        self.assertIn("next", responses[1]["body"])
+        self.assertIn("error", responses[5]["body"])
+
+    def test_batch_admission(self):
+        """Sub-requests are charged to the limits of their own route."""
+        limits = self._shared_store(
+            AdmissionControl,
+            parse_limits("0", "0", "0"),
+            parse_route_limits("/api/res_partner/<int:partner_id>=0.01/2/0"),
+        )
+        partner = self.env["res.partner"].create({"name": "Limited partner"})
+        requests = [{"path": f"/api/res_partner/{partner.id}?fields=id"}] * 3
+        with patch.object(ir_http, "admission", limits):
+            resp = self.url_open(
+                "/api/batch", data=json.dumps(requests), headers=self._get_headers()
+            )
+        resp.raise_for_status()
+        self.assertEqual(
+            [item["status"] for item in resp.json()["responses"]], [200, 200, 429]
+        )
+
+    def test_batch_invalid(self):
+        resp = self.url_open(
+            "/api/batch", data=json.dumps({"path": 1}), headers=self._get_headers()
+        )
+        self.assertEqual(resp.status_code, 400)
+
+
+@tests.tagged("post_install", "-at_install")
+class TestPreflight(tests.HttpCase):
+    def test_preflight_without_cursor(self):
+        headers = {
+            "Origin": "https://app.example.com",
+            "Access-Control-Request-Method": "GET",
+            "Access-Control-Request-Headers": "authorization",
+        }
+        with patch.object(Registry, "cursor", side_effect=AssertionError):
+            resp = self.opener.options(
+                self.base_url() + "/api/res_partner", headers=headers, timeout=10
+            )
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(resp.headers["Access-Control-Allow-Origin"], "*")
+        self.assertIn("Authorization", resp.headers["Access-Control-Allow-Headers"])
+        self.assertEqual(resp.headers["Access-Control-Max-Age"], str(MAX_AGE))
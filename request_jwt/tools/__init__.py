@@ -0,0 +1,13 @@
+"""Helpers shared by the models and controllers of the module."""
+
+from . import shared_cache
+from . import catalog
+from . import token_cache
+from . import compression
+from . import metrics
+from . import encoding
+from . import replica
+from . import search
+from . import changes
+from . import preflight
+from . import admission
@@ -0,0 +1,189 @@
+"""Admission control of the API requests, per JWT subject and route.
+
+Each subject (the ``user_id`` claim of the token, or its ``email``) gets a
+token bucket and a number of concurrent requests per route, and a number of
+concurrent requests over all the routes. Requests beyond
+either limit are refused at once, before the endpoint reads anything, so a
+client looping on a route cannot hold every worker. The state is kept in a
+SQLite file of the data directory shared by the prefork workers of the host,
+like the catalog cache.
+
+Limits are server configuration options, ``0`` disabling them:
+
+* ``request_jwt_rate_limit``: requests per second, 0 by default;
+* ``request_jwt_rate_burst``: size of the bucket, twice the rate by default;
+* ``request_jwt_max_concurrency``: concurrent requests per route, 0 by
+  default;
+* ``request_jwt_max_subject_concurrency``: concurrent requests over all the
+  routes, 0 by default;
+* ``request_jwt_route_limits``: comma separated overrides of a route, as
+  ``route=rate/burst/concurrency``, e.g. ``/api/sale_order/ingest=0.5/2/1``.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+
+def parse_limits(rate, burst, concurrency):
+    """Return the ``(rate, burst, concurrency)`` limits of option values."""
+    rate = float(rate or 0)
+    burst = float(burst) if burst else max(2 * rate, 1)
+    return rate, burst, int(concurrency or 0)
+
+
+def parse_route_limits(value):
+    """Return the limits by route of the ``request_jwt_route_limits`` option."""
+    limits = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        route, _sep, values = item.strip().partition("=")
+        rate, burst, concurrency = (values.split("/") + ["", ""])[:3]
+        limits[route.strip()] = parse_limits(rate, burst, concurrency)
+    return limits
+
+
+class AdmissionControl:
+    """Rate and concurrency limits shared across processes.
+    - A refused request gets the number of seconds after which it may be
+      retried; the concurrency slot of an admitted request must be released
+      once it is served.
+    - Slots older than the real time limit of the workers are ignored, a
+      worker killed while serving a request cannot release its slot.
+    - Storage errors are logged and requests admitted, the admission control
+      never breaks the API.
+    """
+
+    def __init__(self, name, limits, route_limits, subject_concurrency=0):
+        self.name = name
+        self.limits = limits
+        self.route_limits = route_limits
+        self.subject_concurrency = subject_concurrency
+        self.slot_timeout = config.get("limit_time_real") or 120
+        self._local = threading.local()
+
+    @property
+    def path(self):
+        return os.path.join(config["data_dir"], "request_jwt", f"{self.name}.sqlite")
+
+    def _connection(self):
+        # Connections are per thread and must not be inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS slots ("
+            "id INTEGER PRIMARY KEY, key TEXT, started REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS slots_key ON slots (key, started)")
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get_limits(self, route):
+        """Return the ``(rate, burst, concurrency)`` limits of ``route``."""
+        return self.route_limits.get(route, self.limits)
+
+    def acquire(self, dbname, subject, route, nested=False):
+        """Admit a request of ``subject`` on ``route``.
+        - ``nested`` requests run within another admitted request of the
+          subject, like the sub-requests of a batch, and are not counted in
+          the concurrency over all the routes again.
+        - Return ``(slot, retry_after)``: the concurrency slot to release, or
+          ``None``, and ``None`` or the seconds to wait when refused.
+        """
+        rate, burst, concurrency = self.get_limits(route)
+        total = 0 if nested else self.subject_concurrency
+        if not rate and not concurrency and not total:
+            return None, None
+        # Keys of a subject sort between its prefix and the prefix ending
+        # with the character following ":".
+        prefix = f"{dbname}:{subject}:"
+        key = prefix + route
+        now = time.time()
+        slot = retry_after = None
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if concurrency and self._count_slots(conn, key, now) >= concurrency:
+                    retry_after = 1
+                elif total and self._count_subject_slots(conn, prefix, now) >= total:
+                    retry_after = 1
+                elif rate:
+                    retry_after = self._take_token(conn, key, now, rate, burst)
+                if retry_after is None and (concurrency or total):
+                    slot = conn.execute(
+                        "INSERT INTO slots (key, started) VALUES (?, ?)", (key, now)
+                    ).lastrowid
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            _logger.warning("Cannot check the %s limits", self.name, exc_info=True)
+            return None, None
+        return slot, retry_after
+
+    def _count_slots(self, conn, key, now):
+        expired = now - self.slot_timeout
+        conn.execute("DELETE FROM slots WHERE key = ? AND started < ?", (key, expired))
+        return conn.execute(
+            "SELECT COUNT(*) FROM slots WHERE key = ?", (key,)
+        ).fetchone()[0]
+
+    def _count_subject_slots(self, conn, prefix, now):
+        return conn.execute(
+            "SELECT COUNT(*) FROM slots WHERE key > ? AND key < ? AND started >= ?",
+            (prefix, prefix[:-1] + ";", now - self.slot_timeout),
+        ).fetchone()[0]
+
+    def _take_token(self, conn, key, now, rate, burst):
+        """Take a token of the bucket of ``key``, or return the seconds to wait."""
+        row = conn.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+        if tokens < 1:
+            return math.ceil((1 - tokens) / rate)
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+            (key, tokens - 1, now),
+        )
+        return None
+
+    def release(self, slot):
+        """Release the concurrency ``slot`` of an admitted request."""
+        if slot is None:
+            return
+        try:
+            self._connection().execute("DELETE FROM slots WHERE id = ?", (slot,))
+        except sqlite3.Error:
+            _logger.warning("Cannot release a %s slot", self.name, exc_info=True)
+
+
+admission = AdmissionControl(
+    "admission",
+    parse_limits(
+        config.get("request_jwt_rate_limit"),
+        config.get("request_jwt_rate_burst"),
+        config.get("request_jwt_max_concurrency"),
+    ),
+    parse_route_limits(config.get("request_jwt_route_limits")),
+    int(config.get("request_jwt_max_subject_concurrency") or 0),
+)
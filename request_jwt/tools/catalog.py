@@ -0,0 +1,51 @@
+"""Cache of the serialized product catalog."""
+
+import hashlib
+import json
+
+from odoo.tools import config
+
+from .shared_cache import SharedLRUCache
+
+catalog_cache = SharedLRUCache(
+    "catalog_cache",
+    max_bytes=int(config.get("request_jwt_catalog_cache_size", 64 * 1024 * 1024)),
+)
+
+
+def catalog_cache_key(env, *variant):
+    """Return the cache key of a catalog response for ``env``.
+    - Products visible to a user and their serialized values depend on the
+      company, the pricelist, the language and the access groups.
+    - ``variant`` should include the ETag of the response, computed in the
+      snapshot the response is read from.
+    """
+    raw = json.dumps(
+        [
+            env.cr.dbname,
+            env.company.id,
+            env.context.get("pricelist"),
+            env.context.get("lang"),
+            env.user.groups_id.ids,
+            variant,
+        ],
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def invalidate_catalog(env):
+    """Invalidate the cached catalog of the database once ``env`` commits.
+    - Invalidating after the commit prevents another worker from caching the
+      catalog as it was before the transaction; several writes in the same
+      transaction invalidate the cache once.
+    - Invalidating increments the generation of the database, so a response
+      computed from an earlier snapshot and stored afterwards is dropped
+      instead of being cached until the next write.
+    """
+    postcommit = env.cr.postcommit
+    if postcommit.data.get("request_jwt.catalog_invalidated"):
+        return
+    postcommit.data["request_jwt.catalog_invalidated"] = True
+    dbname = env.cr.dbname
+    postcommit.add(lambda: catalog_cache.invalidate(dbname))
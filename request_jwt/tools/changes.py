@@ -0,0 +1,132 @@
+"""Change notifications of the API records, sent through the Odoo bus.
+
+Writes of the API records are collected per transaction and sent, just
+before the commit, as one bus notification per model holding the ids of its
+changed records. The bus stores them in ``bus.bus`` and wakes up listeners
+with a ``NOTIFY imbus``, which ``change_listener`` forwards to the
+long-polling requests waiting for those channels.
+"""
+
+import contextlib
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from odoo import sql_db
+
+_logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "request_jwt/"
+NOTIFICATION_TYPE = "request_jwt/changes"
+SELECT_TIMEOUT = 50
+RETRY_DELAY = 10
+
+
+def change_channel(model_name):
+    """Return the bus channel of the changes of ``model_name``."""
+    return CHANNEL_PREFIX + model_name
+
+
+def notify_changes(records):
+    """Notify the change of ``records`` when the transaction commits.
+    - The records changed in a transaction are sent in a single notification
+      per model, however many times they were written.
+    """
+    if not records:
+        return
+    precommit = records.env.cr.precommit
+    changes = precommit.data.get("request_jwt.changes")
+    if changes is None:
+        changes = precommit.data["request_jwt.changes"] = defaultdict(set)
+        env = records.env
+        precommit.add(lambda: _send_changes(env, changes))
+    changes[records._name].update(records.ids)
+
+
+def _send_changes(env, changes):
+    env["bus.bus"].sudo()._sendmany(
+        [
+            (
+                change_channel(model_name),
+                NOTIFICATION_TYPE,
+                {"model": model_name, "ids": sorted(ids)},
+            )
+            for model_name, ids in changes.items()
+        ]
+    )
+
+
+class ChangeListener:
+    """Listener of the bus notifications, shared by the requests of a process.
+    - A thread listens to ``imbus`` on a dedicated connection, started with
+      the first subscription, and wakes up the subscribers of the notified
+      channels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {event: set of (database, channel)}
+        self._subscribers = {}
+        self._thread = None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{__name__}.listener", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                _logger.exception("Bus listener failed, restarting.")
+                time.sleep(RETRY_DELAY)
+
+    def _listen(self):
+        with sql_db.db_connect("postgres").cursor() as cr:
+            conn = cr._cnx
+            cr.execute("LISTEN imbus")
+            cr.commit()
+            while True:
+                if select.select([conn], [], [], SELECT_TIMEOUT) == ([], [], []):
+                    continue
+                conn.poll()
+                channels = set()
+                while conn.notifies:
+                    payload = json.loads(conn.notifies.pop().payload)
+                    channels.update(
+                        tuple(channel) if isinstance(channel, list) else channel
+                        for channel in payload
+                    )
+                self._wake(channels)
+
+    def _wake(self, channels):
+        with self._lock:
+            for event, subscribed in self._subscribers.items():
+                if subscribed & channels:
+                    event.set()
+
+    @contextlib.contextmanager
+    def subscribe(self, dbname, channels):
+        """Yield an event set when a notification is sent on ``channels``.
+        - Subscribing before reading the notifications ensures that none is
+          missed between the read and the wait.
+        """
+        self._start()
+        event = threading.Event()
+        with self._lock:
+            self._subscribers[event] = {(dbname, channel) for channel in channels}
+        try:
+            yield event
+        finally:
+            with self._lock:
+                del self._subscribers[event]
+
+
+change_listener = ChangeListener()
@@ -0,0 +1,133 @@
+"""Compression of the API responses.
+
+gzip is always available; brotli and zstd are offered when the ``brotli``
+and ``zstandard`` libraries are installed. Levels and the size under which
+buffered responses are left uncompressed are server configuration options.
+"""
+
+import zlib
+
+from odoo.tools import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_SIZE = int(config.get("request_jwt_compression_min_size", 1024))
+LEVELS = {
+    "zstd": int(config.get("request_jwt_compression_level_zstd", 3)),
+    "br": int(config.get("request_jwt_compression_level_br", 4)),
+    "gzip": int(config.get("request_jwt_compression_level_gzip", 6)),
+}
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data) + self._obj.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# By order of preference when the client accepts several encodings.
+COMPRESSORS = {}
+if zstandard:
+    COMPRESSORS["zstd"] = ZstdCompressor
+if brotli:
+    COMPRESSORS["br"] = BrotliCompressor
+COMPRESSORS["gzip"] = GzipCompressor
+ENCODINGS = list(COMPRESSORS)
+
+
+def negotiate(accept_encodings):
+    """Return the encoding to use for the werkzeug ``accept_encodings``."""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compressor(encoding):
+    """Return a new streaming compressor for ``encoding``.
+    - ``compress`` returns the compressed data of a chunk, flushed so that
+      the client can decode it right away; ``finish`` ends the stream.
+    """
+    return COMPRESSORS[encoding](LEVELS[encoding])
+
+
+def compress(encoding, data):
+    """Return ``data`` compressed with ``encoding``."""
+    obj = compressor(encoding)
+    return obj.compress(data) + obj.finish()
+
+
+def iter_compressed(encoding, chunks):
+    """Compress a streamed body chunk by chunk."""
+    obj = compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        if chunk:
+            yield obj.compress(chunk)
+    yield obj.finish()
+
+
+def compress_response(response, accept_encodings):
+    """Compress ``response`` in place if the client accepts it.
+    - Buffered bodies smaller than ``MIN_SIZE`` are left untouched.
+    - The encoding is appended to the ETag, as the compressed body is a
+      different representation.
+    """
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.direct_passthrough
+    ):
+        return response
+    encoding = negotiate(accept_encodings)
+    if not encoding:
+        return response
+    if response.is_streamed:
+        response.response = iter_compressed(encoding, response.response)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(encoding, data))
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
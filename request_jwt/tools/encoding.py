@@ -0,0 +1,67 @@
+"""JSON encoding of the API responses.
+
+orjson is used when installed, the standard library otherwise; the
+``request_jwt_json_backend`` server configuration option (``orjson`` or
+``json``) forces one of them. Both encode dates, datetimes and decimals the
+same way, so serializers can return ORM values as they are read.
+"""
+
+import datetime
+import decimal
+import json
+import logging
+import time
+
+from odoo.tools import config
+
+from . import metrics
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # Datetimes keep the Odoo format used by the API since its first version.
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps_json(data):
+    return json.dumps(data, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_orjson(data):
+    return orjson.dumps(
+        data,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+
+
+BACKENDS = {"json": _dumps_json}
+if orjson:
+    BACKENDS["orjson"] = _dumps_orjson
+
+BACKEND = config.get("request_jwt_json_backend") or ("orjson" if orjson else "json")
+if BACKEND not in BACKENDS:
+    _logger.warning("JSON backend %s is not available, using json.", BACKEND)
+    BACKEND = "json"
+
+
+def dumps(data):
+    """Return ``data`` encoded as JSON bytes with the configured backend."""
+    start = time.perf_counter()
+    body = BACKENDS[BACKEND](data)
+    metrics.record("encode", time.perf_counter() - start)
+    return body
@@ -0,0 +1,228 @@
+"""Timing of the API requests and metrics aggregated across workers.
+
+The phases of the request being served by the current thread (``auth``,
+``sql``, ``serialize``, ``encode``...) are timed in memory. Once the request
+is done, its timings are added to per-route histograms and counters kept by
+each process, and flushed every few seconds into a SQLite file of the data
+directory that every prefork worker of the host shares, like the catalog
+cache. The metrics endpoint renders that file in the Prometheus text format.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Upper bounds of the request duration histogram buckets, in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 10
+PREFIX = "request_jwt"
+# Counters rendered by the metrics endpoint: name, label and description.
+COUNTERS = {
+    "responses": ("responses_total", "status", "API responses by status code."),
+    "phase_seconds": ("phase_seconds_total", "phase", "API time by phase."),
+    "queries": ("sql_queries_total", None, "SQL queries of the API requests."),
+}
+
+_current = threading.local()
+
+
+def start_request():
+    """Start timing the request served by the current thread."""
+    _current.timings = {}
+    _current.start = time.perf_counter()
+
+
+def record(phase, duration):
+    """Add ``duration`` seconds to ``phase`` of the current request, if any."""
+    timings = getattr(_current, "timings", None)
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + duration
+
+
+@contextmanager
+def timed(phase):
+    """Time the block as ``phase`` of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def finish_request():
+    """Stop timing the current request and return its timings.
+    - Return ``None`` if no request was started by the current thread.
+    - The SQL queries and their time are read from the counters Odoo keeps
+      on the thread serving the request.
+    """
+    timings = getattr(_current, "timings", None)
+    if timings is None:
+        return None
+    _current.timings = None
+    thread = threading.current_thread()
+    timings["total"] = time.perf_counter() - _current.start
+    timings["sql"] = getattr(thread, "query_time", 0.0)
+    timings["queries"] = getattr(thread, "query_count", 0)
+    return timings
+
+
+def server_timing(timings):
+    """Return the ``Server-Timing`` header value of ``timings``."""
+    return ", ".join(
+        f'sql;dur={value * 1000:.1f};desc="{timings["queries"]} queries"'
+        if phase == "sql"
+        else f"{phase};dur={value * 1000:.1f}"
+        for phase, value in timings.items()
+        if phase != "queries"
+    )
+
+
+def _label(value):
+    """Return ``value`` escaped for a label of the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class SharedMetrics:
+    """Counters of the API requests shared across processes.
+    - Each process adds up its observations in memory and flushes them at
+      most every ``FLUSH_INTERVAL`` seconds, so the storage is not written
+      by every request.
+    - Storage errors are logged and the pending observations dropped, the
+      metrics never break the request they measure.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending = {}
+        self._pid = os.getpid()
+        self._flushed = time.monotonic()
+
+    @property
+    def path(self):
+        return os.path.join(config["data_dir"], "request_jwt", f"{self.name}.sqlite")
+
+    def _connection(self):
+        # Connections are per thread and must not be inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "name TEXT, route TEXT, label TEXT, value REAL, "
+            "PRIMARY KEY (name, route, label))"
+        )
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _add(self, name, route, label, value):
+        key = (name, route, label)
+        self._pending[key] = self._pending.get(key, 0) + value
+
+    def observe(self, route, status, timings):
+        """Add the ``timings`` of a request to the metrics of ``route``."""
+        total = timings["total"]
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pending, self._pid = {}, os.getpid()
+            for bound in BUCKETS:
+                if total <= bound:
+                    self._add("duration_bucket", route, repr(bound), 1)
+            self._add("duration_bucket", route, "+Inf", 1)
+            self._add("duration_sum", route, "", total)
+            self._add("responses", route, str(status), 1)
+            self._add("queries", route, "", timings["queries"])
+            for phase, value in timings.items():
+                if phase not in ("total", "queries"):
+                    self._add("phase_seconds", route, phase, value)
+            due = time.monotonic() - self._flushed >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending observations of the process to the storage."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO metrics (name, route, label, value) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT (name, route, label) "
+                    "DO UPDATE SET value = value + excluded.value",
+                    [key + (value,) for key, value in pending.items()],
+                )
+        except sqlite3.Error:
+            _logger.warning("Cannot write the %s metrics", self.name, exc_info=True)
+
+    def collect(self):
+        """Return the ``(name, route, label, value)`` rows of all the workers."""
+        self.flush()
+        try:
+            return (
+                self._connection()
+                .execute(
+                    "SELECT name, route, label, value FROM metrics "
+                    "ORDER BY name, route, label"
+                )
+                .fetchall()
+            )
+        except sqlite3.Error:
+            _logger.warning("Cannot read the %s metrics", self.name, exc_info=True)
+            return []
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        histograms, counters = {}, {}
+        for name, route, label, value in self.collect():
+            if name == "duration_bucket":
+                histograms.setdefault(route, {})[label] = value
+            elif name == "duration_sum":
+                histograms.setdefault(route, {})["sum"] = value
+            else:
+                counters.setdefault(name, []).append((route, label, value))
+        metric = f"{PREFIX}_request_duration_seconds"
+        lines = [
+            f"# HELP {metric} Duration of the API requests.",
+            f"# TYPE {metric} histogram",
+        ]
+        for route, values in sorted(histograms.items()):
+            route = _label(route)
+            for bound in BUCKETS:
+                value = values.get(repr(bound), 0)
+                lines.append(
+                    f'{metric}_bucket{{route="{route}",le="{bound}"}} {value:g}'
+                )
+            count = values.get("+Inf", 0)
+            lines += [
+                f'{metric}_bucket{{route="{route}",le="+Inf"}} {count:g}',
+                f'{metric}_sum{{route="{route}"}} {values.get("sum", 0):.6f}',
+                f'{metric}_count{{route="{route}"}} {count:g}',
+            ]
+        for name, (suffix, label_name, help_text) in COUNTERS.items():
+            metric = f"{PREFIX}_{suffix}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for route, label, value in counters.get(name, []):
+                labels = f'route="{_label(route)}"'
+                if label_name:
+                    labels += f',{label_name}="{_label(label)}"'
+                lines.append(f"{metric}{{{labels}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+api_metrics = SharedMetrics("metrics")
@@ -0,0 +1,62 @@
+"""Answer of the CORS preflight requests of the API without a database.
+
+Odoo dispatches ``OPTIONS`` requests like the others: it opens a cursor,
+matches the route and authenticates the request before answering the
+preflight. Preflight requests to ``/api/`` are answered before any of this,
+the API routes all allowing any origin. ``Access-Control-Max-Age`` is the
+``request_jwt_cors_max_age`` server option, in seconds (one day by default;
+browsers may use a lower limit of their own).
+"""
+
+import functools
+
+from odoo import http
+from odoo.tools import config
+
+ALLOWED_METHODS = "GET, POST, OPTIONS"
+ALLOWED_HEADERS = (
+    "Accept, Accept-Encoding, Authorization, Content-Type, If-Modified-Since, "
+    "If-None-Match, Origin, Range, X-Requested-With"
+)
+MAX_AGE = int(config.get("request_jwt_cors_max_age", 24 * 60 * 60))
+
+
+def is_preflight(httprequest):
+    """Return whether ``httprequest`` is a CORS preflight request to the API."""
+    return (
+        httprequest.method == "OPTIONS"
+        and httprequest.path.startswith("/api/")
+        and "Access-Control-Request-Method" in httprequest.headers
+    )
+
+
+def preflight_response():
+    """Return the response of the CORS preflight requests to the API."""
+    return http.Response(
+        status=204,
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": ALLOWED_METHODS,
+            "Access-Control-Allow-Headers": ALLOWED_HEADERS,
+            "Access-Control-Max-Age": str(MAX_AGE),
+        },
+    )
+
+
+def patch_request():
+    """Answer the API preflight requests before a cursor is opened.
+    - The patch applies to every database of the server, as it is made
+      before the database of the request is known to have the module.
+    """
+    serve_db = http.Request._serve_db
+    if getattr(serve_db, "_request_jwt_preflight", False):
+        return
+
+    @functools.wraps(serve_db)
+    def _serve_db(self):
+        if is_preflight(self.httprequest):
+            return preflight_response()
+        return serve_db(self)
+
+    _serve_db._request_jwt_preflight = True
+    http.Request._serve_db = _serve_db
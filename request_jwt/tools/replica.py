@@ -0,0 +1,98 @@
+"""Routing of read-only requests to a PostgreSQL read replica.
+
+The replica is set with the ``request_jwt_replica_dsn`` server configuration
+option, a libpq connection string or URI without the database name, the
+database of the request being used on the replica too. A replica is skipped
+for ``RETRY_DELAY`` seconds when it cannot be reached, or when its replay lag
+is above ``request_jwt_replica_max_lag`` seconds (10 by default); the lag is
+checked at most every ``CHECK_INTERVAL`` seconds per database and process.
+"""
+
+import logging
+import threading
+import time
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+from odoo import sql_db
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 5
+RETRY_DELAY = 30
+# A server which is not in recovery is not a replica of anything, it is used
+# as is, which allows testing against a second local instance.
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class ReplicaRouter:
+    """Provider of read-only cursors on the replica of a database."""
+
+    def __init__(self, dsn, max_lag, maxconn):
+        self.dsn = dsn
+        self.max_lag = max_lag
+        self.maxconn = maxconn
+        self._pool = None
+        self._lock = threading.Lock()
+        # {dbname: (available, time of the next check)}
+        self._state = {}
+
+    def _connection(self, dbname):
+        with self._lock:
+            if self._pool is None:
+                self._pool = sql_db.ConnectionPool(self.maxconn)
+        dsn = dict(parse_dsn(self.dsn), dbname=dbname)
+        return sql_db.Connection(self._pool, dbname, dsn)
+
+    def _set_state(self, dbname, available, delay):
+        self._state[dbname] = (available, time.monotonic() + delay)
+
+    def cursor(self, dbname):
+        """Return a read-only cursor on the replica of ``dbname``.
+        - Return ``None`` when no replica is configured, or when it is
+          unavailable or lagging, to use the primary database instead.
+        """
+        if not self.dsn:
+            return None
+        available, next_check = self._state.get(dbname, (True, 0))
+        check = time.monotonic() >= next_check
+        if not available and not check:
+            return None
+        try:
+            cr = self._connection(dbname).cursor()
+        except psycopg2.Error:
+            _logger.warning("Read replica of %s unavailable.", dbname, exc_info=True)
+            self._set_state(dbname, False, RETRY_DELAY)
+            return None
+        try:
+            cr.execute("SET TRANSACTION READ ONLY")
+            if check:
+                cr.execute(LAG_QUERY)
+                lag = cr.fetchone()[0] or 0
+                if lag > self.max_lag:
+                    _logger.warning("Read replica of %s lags %.1fs.", dbname, lag)
+                    self._set_state(dbname, False, RETRY_DELAY)
+                    cr.close()
+                    return None
+                self._set_state(dbname, True, CHECK_INTERVAL)
+        except psycopg2.Error:
+            _logger.warning("Read replica of %s unavailable.", dbname, exc_info=True)
+            self._set_state(dbname, False, RETRY_DELAY)
+            cr.close()
+            return None
+        return cr
+
+
+replica = ReplicaRouter(
+    config.get("request_jwt_replica_dsn"),
+    max_lag=float(config.get("request_jwt_replica_max_lag", 10)),
+    maxconn=int(config.get("request_jwt_replica_maxconn", config["db_maxconn"])),
+)
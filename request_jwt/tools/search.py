@@ -0,0 +1,87 @@
+"""Ranked text search backed by trigram indexes.
+
+Text is matched by ``ILIKE`` substrings and, with the ``pg_trgm`` extension,
+by the word similarity operator ``<%`` which tolerates typos; both are served
+by GIN ``gin_trgm_ops`` indexes. Without ``pg_trgm``, only substrings are
+matched, by sequential scans.
+"""
+
+import logging
+
+import psycopg2
+
+from odoo import tools
+
+_logger = logging.getLogger(__name__)
+
+# LIKE patterns of the values starting with the searched text: a column
+# value, or one of the strings of a JSON array cast to text, like the
+# translations of a name.
+PREFIX_PATTERN = "{}%"
+JSON_PREFIX_PATTERN = '%"{}%'
+
+
+def create_trigram_indexes(cr, table, indexes):
+    """Create the trigram indexes of ``table``.
+    - ``indexes`` maps the index names to the SQL expressions they index.
+    - The ``pg_trgm`` extension is created if missing; when the database user
+      may not create it, a warning is logged and no index is created.
+    """
+    cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if not cr.rowcount:
+        try:
+            with cr.savepoint(flush=False):
+                cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error:
+            _logger.warning(
+                "Cannot create the pg_trgm extension, the search of %s is not "
+                "indexed. Run CREATE EXTENSION pg_trgm as a superuser.",
+                table,
+            )
+            return
+    for name, expression in indexes.items():
+        tools.create_index(cr, name, table, [f"({expression}) gin_trgm_ops"], "gin")
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def ranked_search(model, text, limit):
+    """Return the ids of the ``model`` records best matching ``text``.
+    - The matched SQL expressions are returned by the
+      ``_api_search_columns(query)`` method of the model, with the pattern of
+      their values starting with ``text`` (``PREFIX_PATTERN`` or
+      ``JSON_PREFIX_PATTERN``). They must be the expressions of its trigram
+      indexes for the search to be indexed.
+    - Records are filtered by the record rules of the user of ``model``.
+    - Records where a value starts with ``text`` come first, then the
+      records are sorted by their best word similarity with ``text``.
+    """
+    has_trigram = model.env.registry.has_trigram
+    query = model._search([])
+    columns, prefixes = zip(*model._api_search_columns(query))
+    escaped = _escape_like(text)
+    like = f"%{escaped}%"
+    matches = [f"{column} ILIKE %s" for column in columns]
+    match_params = [like] * len(columns)
+    ranks = [f"({' OR '.join(f'{column} ILIKE %s' for column in columns)}) DESC"]
+    rank_params = [prefix.format(escaped) for prefix in prefixes]
+    if has_trigram:
+        matches += [f"%s <%% {column}" for column in columns]
+        match_params += [text] * len(columns)
+        similarities = [f"word_similarity(%s, {column})" for column in columns]
+        ranks.append(f"GREATEST({', '.join(similarities)}) DESC")
+        rank_params += [text] * len(columns)
+    query.add_where(" OR ".join(matches), match_params)
+    from_clause, where_clause, where_params = query.get_sql()
+    model.env.cr.execute(
+        f"""
+        SELECT "{model._table}".id FROM {from_clause}
+        WHERE {where_clause}
+        ORDER BY {", ".join(ranks)}, "{model._table}".id
+        LIMIT %s
+        """,
+        where_params + rank_params + [limit],
+    )
+    return [row[0] for row in model.env.cr.fetchall()]
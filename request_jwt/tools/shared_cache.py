@@ -0,0 +1,244 @@
+"""LRU cache shared by all the workers of the server.
+
+Odoo runs as prefork workers, so a per-process cache would be duplicated
+in every worker and could not be invalidated from another one. Entries are
+kept in a SQLite file in the data directory instead, which every worker of
+the host opens, and the total size of the entries is bounded by evicting
+the least recently used ones.
+
+Lookups only read the file: the last use of the entries and the hit and miss
+counters are kept in memory by each worker and written at most every
+``FLUSH_INTERVAL`` seconds, so hits do not wait for the write lock of the
+other workers.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+STATS = ("hits", "misses", "evictions", "invalidations")
+# Seconds after which the pending lookups of a worker are written.
+FLUSH_INTERVAL = 10
+
+
+class SharedLRUCache:
+    """Bounded key/value store shared across processes.
+    - Every entry belongs to a ``namespace`` (typically a database name)
+      which can be invalidated at once.
+    - Every namespace has a generation, incremented when it is invalidated;
+      a value computed before an invalidation is not stored.
+    - Storage errors are logged and handled as cache misses, the cache never
+      breaks the request it serves.
+    """
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # {key: time of the last use} and {stat: value} of the pending lookups.
+        self._used = {}
+        self._stats = {}
+        self._pid = os.getpid()
+        self._flushed = time.monotonic()
+
+    @property
+    def path(self):
+        return os.path.join(config["data_dir"], "request_jwt", f"{self.name}.sqlite")
+
+    def _connection(self):
+        # Connections are per thread and must not be inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, namespace TEXT, value BLOB, "
+            "size INTEGER, used REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "namespace TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _incr(self, conn, stat, value=1):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (stat, value),
+        )
+
+    def get(self, key):
+        """Return the value stored for ``key``, or ``None``."""
+        try:
+            row = (
+                self._connection()
+                .execute("SELECT value FROM entries WHERE key = ?", (key,))
+                .fetchone()
+            )
+        except sqlite3.Error:
+            _logger.warning("Cannot read the %s cache", self.name, exc_info=True)
+            return None
+        self._record_lookup(key if row is not None else None)
+        return row[0] if row is not None else None
+
+    def _record_lookup(self, key):
+        """Count a hit of ``key``, or a miss if ``key`` is ``None``."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._used, self._stats, self._pid = {}, {}, os.getpid()
+            stat = "misses" if key is None else "hits"
+            self._stats[stat] = self._stats.get(stat, 0) + 1
+            if key is not None:
+                self._used[key] = time.time()
+            due = time.monotonic() - self._flushed >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending lookups of the process to the storage."""
+        with self._lock:
+            used, self._used = self._used, {}
+            stats, self._stats = self._stats, {}
+            self._flushed = time.monotonic()
+        if not used and not stats:
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE entries SET used = ? WHERE key = ?",
+                    [(used_at, key) for key, used_at in used.items()],
+                )
+                for stat, value in stats.items():
+                    self._incr(conn, stat, value)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            _logger.warning("Cannot write the %s cache", self.name, exc_info=True)
+
+    def generation(self, namespace):
+        """Return the generation of ``namespace``, to be passed to ``set``."""
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT value FROM generations WHERE namespace = ?", (namespace,)
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            _logger.warning("Cannot read the %s cache", self.name, exc_info=True)
+            return None
+        return row[0] if row else 0
+
+    def set(self, namespace, key, value, generation=None):
+        """Store ``value`` (bytes) for ``key`` and evict the LRU entries.
+        - ``generation`` is the one of ``namespace`` read before ``value``
+          was computed; nothing is stored if it was invalidated since.
+        """
+        if len(value) > self.max_bytes:
+            return
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if generation is not None:
+                    row = conn.execute(
+                        "SELECT value FROM generations WHERE namespace = ?",
+                        (namespace,),
+                    ).fetchone()
+                    if (row[0] if row else 0) != generation:
+                        conn.execute("ROLLBACK")
+                        return
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(key, namespace, value, size, used) VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, value, len(value), time.time()),
+                )
+                total = conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+                evicted = 0
+                while total > self.max_bytes:
+                    oldest = conn.execute(
+                        "SELECT key, size FROM entries ORDER BY used LIMIT 32"
+                    ).fetchall()
+                    for old_key, size in oldest:
+                        if total <= self.max_bytes:
+                            break
+                        conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                        total -= size
+                        evicted += 1
+                if evicted:
+                    self._incr(conn, "evictions", evicted)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            _logger.warning("Cannot write the %s cache", self.name, exc_info=True)
+
+    def invalidate(self, namespace):
+        """Drop every entry of ``namespace``."""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                conn.execute(
+                    "INSERT INTO generations (namespace, value) VALUES (?, 1) "
+                    "ON CONFLICT (namespace) DO UPDATE SET value = value + 1",
+                    (namespace,),
+                )
+                self._incr(conn, "invalidations")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error:
+            _logger.warning("Cannot invalidate the %s cache", self.name, exc_info=True)
+
+    def stats(self):
+        """Return the usage counters and the current size of the cache.
+        - The lookups of the other workers are counted once they are flushed.
+        """
+        self.flush()
+        data = dict.fromkeys(STATS, 0)
+        try:
+            conn = self._connection()
+            data.update(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        except sqlite3.Error:
+            _logger.warning("Cannot read the %s cache", self.name, exc_info=True)
+            entries = size = 0
+        lookups = data["hits"] + data["misses"]
+        data.update(
+            entries=entries,
+            size=size,
+            max_size=self.max_bytes,
+            hit_ratio=data["hits"] / lookups if lookups else 0.0,
+        )
+        return data
@@ -0,0 +1,50 @@
+"""Cache of the JWT tokens already verified by a worker."""
+
+import collections
+import threading
+import time
+
+from odoo.tools import config
+
+
+class TokenCache:
+    """Bounded LRU mapping of token keys to their authentication result.
+    - Entries expire at their own expiry time.
+    - Entries are tagged with the registry cache sequence, which changes in
+      every worker when the caches of the registry are cleared (e.g. after a
+      validator or a system parameter is written), so that stale entries are
+      dropped without any cross-worker communication.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, sequence):
+        """Return the value cached for ``key`` or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_sequence, expiry, value = entry
+            if entry_sequence != sequence or expiry <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, sequence, expiry, value):
+        """Cache ``value`` for ``key`` until ``expiry`` (a timestamp)."""
+        with self._lock:
+            self._entries[key] = (sequence, expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(int(config.get("request_jwt_token_cache_size", 4096)))